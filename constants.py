@@ -1,9 +1,10 @@
-import os
-import random
+import re
+from collections import deque
+from types import MappingProxyType
 
 # --- UPDATED: Centralized data structure for all chats ---
 global_data = {
-    "all_chat_data": {} # Stores chat_id: {player_stats: {}, match_counter: int, match_history: [], group_admins: [], consecutive_idle_matches: 0}
+    "all_chat_data": {} # Stores chat_id: {player_stats: {}, match_counter: int, match_history: [], group_admins: set(), consecutive_idle_matches: 0}
 }
 
 def get_chat_data_for_id(chat_id: int):
@@ -11,43 +12,104 @@ def get_chat_data_for_id(chat_id: int):
     Retrieves or initializes the chat-specific data from global_data.
     This ensures that each chat maintains its own game state, player scores, etc.
     """
-    if chat_id not in global_data["all_chat_data"]:
-        global_data["all_chat_data"][chat_id] = {
+    all_chat_data = global_data["all_chat_data"]
+    chat_data = all_chat_data.get(chat_id) # Fast path: a single lookup for chats we've already seen
+    if chat_data is None:
+        chat_data = all_chat_data[chat_id] = {
             "player_stats": {}, # Stores user_id: {username: str, score: int, wins: int, losses: int, last_active: datetime}
+            "username_index": {}, # Lowercased username -> set of user_ids for players in player_stats; kept in step by index_username()
             "match_counter": 1, # Unique ID for each match within a chat
-            "match_history": [], # Stores past match results
-            "group_admins": [], # Cached list of admin user_ids for this specific chat
-            "consecutive_idle_matches": 0 # New: Tracks idle matches for auto-stopping
+            "match_history": deque(maxlen=20), # Stores the last 20 match results; oldest are evicted on append
+            "group_admins": set(), # Cached set of admin user_ids for this specific chat (set for O(1) is_admin checks)
+            "consecutive_idle_matches": 0, # New: Tracks idle matches for auto-stopping
+            "leaderboard_text": None # Rendered /leaderboard message; reset to None whenever a score, win or loss changes
         }
-    return global_data["all_chat_data"][chat_id]
+    return chat_data
+
+def index_username(chat_data: dict, user_id: int, old_username, new_username: str):
+    """
+    Files user_id under new_username in chat_data's username_index, removing it from the
+    entry for old_username (None for a new player). Display names fall back to first names
+    and are not unique, so each entry is a set of user_ids.
+    """
+    username_index = chat_data["username_index"]
+    if old_username is not None:
+        old_key = old_username.lower()
+        user_ids = username_index.get(old_key)
+        if user_ids is not None:
+            user_ids.discard(user_id)
+            if not user_ids:
+                del username_index[old_key]
+    username_index.setdefault(new_username.lower(), set()).add(user_id)
+
+def find_user_by_username(chat_data: dict, username: str):
+    """
+    Returns the user_id of the player in chat_data whose username matches (case-insensitively),
+    or None if there is none. If several players share the name, the first one in player_stats wins.
+    """
+    user_ids = chat_data["username_index"].get(username.lower())
+    if not user_ids:
+        return None
+    if len(user_ids) == 1:
+        return next(iter(user_ids))
+    for uid in chat_data["player_stats"]:
+        if uid in user_ids:
+            return uid
+    return None
 # --- END UPDATED ---
 
+# Matches any character escape_markdown() would need to escape
+MARKDOWN_SPECIALS_RE = re.compile(r"[_*\[`]")
+
+# Translation table for escaping Telegram (legacy) Markdown special characters in one pass
+MARKDOWN_ESCAPE_TABLE = str.maketrans({
+    "_": "\\_",
+    "*": "\\*",
+    "[": "\\[",
+    "`": "\\`",
+})
+
+def escape_markdown(text: str) -> str:
+    """
+    Escapes Markdown special characters (_ * [ `) in user-provided text such as usernames,
+    so it can be embedded in messages sent with parse_mode="Markdown".
+    """
+    if MARKDOWN_SPECIALS_RE.search(text) is None:
+        return text # Most usernames are clean; skip building a copy
+    return text.translate(MARKDOWN_ESCAPE_TABLE)
+
 # Hardcoded global administrators (Telegram User IDs)
 # These users will always have admin privileges regardless of specific group admin status.
 # Replace with actual user IDs for your global admins.
-HARDCODED_ADMINS = [
+# Stored as a frozenset so the per-command admin check is an O(1) membership test.
+HARDCODED_ADMINS = frozenset({
     1599213796,  # Replace with a real admin's User ID (e.g., your ID)
     # Add more admin IDs here if needed
-]
+})
 
 # Allowed Group IDs
 # The bot will only function in these specific groups.
 # Replace with the actual Telegram Group IDs where you want the bot to run.
 # You can get a group's ID by forwarding a message from the group to @userinfobot
-ALLOWED_GROUP_IDS = [
+# Checked on every incoming update, so it is a frozenset rather than a list.
+ALLOWED_GROUP_IDS = frozenset({
     -1002689980361,
     -4859500151,
-]
+})
 
 
 # Initial score for new players
 INITIAL_PLAYER_SCORE = 1000
 
+# Amount placed by one press of a BIG/SMALL/LUCKY inline button
+BUTTON_BET_AMOUNT = 100
+
 # Emojis for results (optional, but adds flair!)
-RESULT_EMOJIS = {
+# Read-only view so nothing can mutate it at runtime.
+RESULT_EMOJIS = MappingProxyType({
     "big": "⬆️",
     "small": "⬇️",
     "lucky": "💎"
-}
+})
 
 # Add more constants if needed, e.g., default bet amounts, game cool-downs, etc.
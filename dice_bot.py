@@ -2,10 +2,18 @@
 # dice_bot.py - Enhanced Dice Betting Game Bot
 
 import os
-import random
+import asyncio
+from random import randint as _randint
 import logging
 import json
-from typing import Dict, Any
+import heapq
+from typing import Dict, Any, List, Optional, Tuple
+
+# orjson encodes much faster than the stdlib json module; fall back to json if it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 # <<< FIX 1: Import load_dotenv before using it.
 from dotenv import load_dotenv
@@ -32,25 +40,107 @@ logger = logging.getLogger(__name__)
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 # Ensure ADMINS are correctly parsed as integers
 ADMIN_IDS_STR = os.getenv("TELEGRAM_ADMIN_IDS", "")
-ADMINS = [int(id.strip()) for id in ADMIN_IDS_STR.split(",") if id.strip()]
+ADMINS = frozenset(int(id.strip()) for id in ADMIN_IDS_STR.split(",") if id.strip()) # frozenset for O(1) membership checks
 INITIAL_POINTS = 1000
 MAX_BET = 5000
+# (bet type, payout multiplier) indexed by sign(total - 7) + 1
+OUTCOMES = (("small", 2), ("lucky", 5), ("big", 2))
 DATA_FILE = "dice_bot_data.json" # <<< FIX 3: Data persistence file
+SAVE_INTERVAL = 2.0 # Seconds between flushes of pending changes to DATA_FILE
+
+# Starting fields for a new user; copied by DiceGame.initialize_user
+USER_TEMPLATE = {
+    "points": INITIAL_POINTS,
+    "total_bet": 0,
+    "wins": 0,
+    "losses": 0,
+}
+
+# --- Static Messages ---
+# Built once at import; the handlers below send them unchanged
+START_MSG = (
+    "🎲 Welcome to Dice Bet Game! 🎲\n\n"
+    "**Commands:**\n"
+    "`/startdice` - Start a new betting round\n"
+    "`/b <amount>` - Bet on Big (8-12)\n"
+    "`/s <amount>` - Bet on Small (2-6)\n"
+    "`/l <amount>` - Bet on Lucky 7\n"
+    "`/roll` - Roll the dice to end the round\n"
+    "`/score` - Check your points and stats\n"
+    "`/leaderboard` - Show the top players\n"
+    "`/help` - Show this message again"
+)
+STARTDICE_MSG = (
+    "💰 **New betting round started!**\n\n"
+    "Place your bets now:\n"
+    "▪️ `/b <amount>` - **Big** (8-12) pays 2x\n"
+    "▪️ `/s <amount>` - **Small** (2-6) pays 2x\n"
+    "▪️ `/l <amount>` - **Lucky 7** pays 5x\n\n"
+    f"Example: `/b 100` (Max bet per type: {MAX_BET})"
+)
+NO_BETS_MSG = "No one has placed any bets yet!\nUse `/b`, `/s`, or `/l` to join the round."
 
 # --- Game State ---
 # These will be loaded from the file
 users: Dict[int, Dict[str, Any]] = {}
 leaderboard: Dict[int, int] = {}
+# Cached top 10 (user_id, points) pairs; reset to None whenever points change
+top_players: Optional[List[Tuple[int, int]]] = None
+
+def invalidate_leaderboard():
+    """Marks the cached top 10 as stale so the next /leaderboard rebuilds it."""
+    global top_players
+    top_players = None
+
+# Set when users/leaderboard changed since the last save; flushed by flush_data()
+data_dirty = False
+
+def mark_dirty():
+    """Schedules the game state to be written on the next flush."""
+    global data_dirty
+    data_dirty = True
 
 # <<< FIX 3: Add functions for data persistence
-def save_data():
-    """Saves the current game state to a JSON file."""
+def encode_data() -> bytes:
+    """Serializes the current game state to compact JSON bytes."""
+    state = {"users": users, "leaderboard": leaderboard}
+    if orjson is not None:
+        # user IDs are int keys, which orjson only accepts with OPT_NON_STR_KEYS
+        return orjson.dumps(state, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(state, separators=(",", ":")).encode()
+
+def write_atomic(path: str, payload: bytes) -> None:
+    """Writes payload to a temp file and swaps it in, so a crash mid-write never corrupts path."""
+    tmp_file = path + ".tmp"
+    with open(tmp_file, "wb") as f:
+        f.write(payload)
+    os.replace(tmp_file, path)
+
+async def save_data() -> bool:
+    """Saves the current game state to a JSON file without blocking the event loop. Returns True on success."""
+    # Encode on the event loop so handlers can't mutate users mid-serialization; only the disk I/O runs in a thread
+    payload = encode_data()
     try:
-        with open(DATA_FILE, "w") as f:
-            json.dump({"users": users, "leaderboard": leaderboard}, f, indent=4)
+        await asyncio.to_thread(write_atomic, DATA_FILE, payload)
         logger.info("Game data saved successfully.")
+        return True
     except IOError as e:
         logger.error(f"Error saving data to {DATA_FILE}: {e}")
+        return False
+
+async def flush_data(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Job callback that saves the game state only if it changed since the last flush."""
+    global data_dirty
+    if not data_dirty:
+        return
+    data_dirty = False
+    if not await save_data():
+        data_dirty = True # Retry on the next flush
+
+async def flush_on_shutdown(application: Application) -> None:
+    """Writes out any pending changes before the bot exits."""
+    if data_dirty:
+        await save_data()
 
 def load_data():
     """Loads game state from a JSON file if it exists."""
@@ -61,7 +151,10 @@ def load_data():
                 data = json.load(f)
                 # JSON saves integer keys as strings, so we need to convert them back
                 users = {int(k): v for k, v in data.get("users", {}).items()}
+                for user_data in users.values():
+                    user_data.setdefault("total_bet", sum(user_data.get("bets", {}).values()))
                 leaderboard = {int(k): v for k, v in data.get("leaderboard", {}).items()}
+                invalidate_leaderboard()
                 logger.info("Game data loaded successfully.")
     except (IOError, json.JSONDecodeError) as e:
         logger.error(f"Error loading data from {DATA_FILE}: {e}")
@@ -88,42 +181,22 @@ class DiceGame:
     def initialize_user(user_id: int, username: str) -> None:
         """Initialize a new user in the game."""
         if user_id not in users:
-            users[user_id] = {
-                "points": INITIAL_POINTS,
-                "bets": {},
-                "username": username,
-                "wins": 0,
-                "losses": 0,
-            }
-            logger.info(f"New user {username} ({user_id}) initialized with {INITIAL_POINTS} points.")
+            user_data = USER_TEMPLATE.copy()
+            user_data["bets"] = {} # Each user needs their own bets dict, so it isn't part of the template
+            user_data["username"] = username
+            users[user_id] = user_data
+            invalidate_leaderboard()
+            logger.info("New user %s (%s) initialized with %s points.", username, user_id, INITIAL_POINTS)
 
 # <<< FIX 2: All handlers must now be async
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Send welcome message on /start."""
-    await update.message.reply_text(
-        "🎲 Welcome to Dice Bet Game! 🎲\n\n"
-        "**Commands:**\n"
-        "`/startdice` - Start a new betting round\n"
-        "`/b <amount>` - Bet on Big (8-12)\n"
-        "`/s <amount>` - Bet on Small (2-6)\n"
-        "`/l <amount>` - Bet on Lucky 7\n"
-        "`/roll` - Roll the dice to end the round\n"
-        "`/score` - Check your points and stats\n"
-        "`/leaderboard` - Show the top players\n"
-        "`/help` - Show this message again"
-    )
+    await update.message.reply_text(START_MSG)
 
 async def start_dice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Start a new betting round."""
     # <<< FIX 5: This loop is redundant if roll_dice clears bets. Removed for clarity.
-    await update.message.reply_text(
-        "💰 **New betting round started!**\n\n"
-        "Place your bets now:\n"
-        "▪️ `/b <amount>` - **Big** (8-12) pays 2x\n"
-        "▪️ `/s <amount>` - **Small** (2-6) pays 2x\n"
-        "▪️ `/l <amount>` - **Lucky 7** pays 5x\n\n"
-        f"Example: `/b 100` (Max bet per type: {MAX_BET})"
-    )
+    await update.message.reply_text(STARTDICE_MSG)
 
 async def validate_bet(update: Update, amount: int) -> bool:
     """Validate the bet amount."""
@@ -138,7 +211,7 @@ async def validate_bet(update: Update, amount: int) -> bool:
         await update.message.reply_text(f"❌ Maximum bet is {MAX_BET} points.")
         return False
 
-    current_total_bet = sum(users[user_id].get("bets", {}).values())
+    current_total_bet = users[user_id]["total_bet"]
     if users[user_id]["points"] < current_total_bet + amount:
         await update.message.reply_text(
             f"❌ You don't have enough points.\n"
@@ -169,74 +242,69 @@ async def place_bet(update: Update, context: ContextTypes.DEFAULT_TYPE, bet_type
         return
 
     # Check for existing bet of this type and overwrite/add
-    users[user_id]["bets"][bet_type] = amount
-    total_bet = sum(users[user_id]['bets'].values())
+    user_bets = users[user_id]["bets"]
+    total_bet = users[user_id]["total_bet"] - user_bets.get(bet_type, 0) + amount
+    user_bets[bet_type] = amount
+    users[user_id]["total_bet"] = total_bet
     
     await update.message.reply_text(
         f"✅ {username}, your bet on **{bet_type.capitalize()}** for `{amount}` points is placed.\n"
         f"Your total bet this round is now `{total_bet}` points."
     )
-    logger.info(f"{username} ({user_id}) placed {bet_type} bet: {amount}")
+    logger.info("%s (%s) placed %s bet: %s", username, user_id, bet_type, amount)
 
 async def roll_dice(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Roll dice and calculate results."""
-    active_players = {
-        uid: data for uid, data in users.items()
-        if data.get("bets") and sum(data["bets"].values()) > 0
-    }
-
-    if not active_players:
-        await update.message.reply_text(
-            "No one has placed any bets yet!\nUse `/b`, `/s`, or `/l` to join the round."
-        )
-        return
-
-    dice1 = random.randint(1, 6)
-    dice2 = random.randint(1, 6)
+    dice1 = _randint(1, 6)
+    dice2 = _randint(1, 6)
     total = dice1 + dice2
+    # Determine winning condition: index 0 is small, 1 is lucky 7, 2 is big
+    winning_type, multiplier = OUTCOMES[(total > 7) - (total < 7) + 1]
 
-    result_msg = (
+    result_parts = [
         f"🎲 **The dice are rolled!** 🎲\n\n"
         f"Result: `{dice1} + {dice2} = {total}`\n\n"
         "--- **Payouts** ---\n"
-    )
-
-    for user_id, data in active_players.items():
+    ]
+
+    active_count = 0
+    for data in users.values():
+        total_bet = data["total_bet"]
+        if total_bet <= 0:
+            continue # Not in this round
+        active_count += 1
         username = data["username"]
         bets = data["bets"]
-        total_bet = sum(bets.values())
-        payout = 0
-
-        # Determine winning condition
-        if total > 7:
-            payout = bets.get("big", 0) * 2
-        elif total < 7:
-            payout = bets.get("small", 0) * 2
-        elif total == 7:
-            payout = bets.get("lucky", 0) * 5
+        payout = bets.get(winning_type, 0) * multiplier
 
         net_change = payout - total_bet
-        users[user_id]["points"] += net_change
+        data["points"] += net_change
 
         if net_change > 0:
-            users[user_id]["wins"] += 1
-            result_msg += f"🟢 {username} won `{net_change}` points!\n"
+            data["wins"] += 1
+            result_parts.append(f"🟢 {username} won `{net_change}` points!\n")
         elif net_change < 0:
-            users[user_id]["losses"] += 1
-            result_msg += f"🔴 {username} lost `{abs(net_change)}` points.\n"
+            data["losses"] += 1
+            result_parts.append(f"🔴 {username} lost `{abs(net_change)}` points.\n")
         else:
-            result_msg += f"🟡 {username} broke even.\n"
+            result_parts.append(f"🟡 {username} broke even.\n")
         
-        result_msg += f"   New balance: `{users[user_id]['points']}`\n"
+        result_parts.append(f"   New balance: `{data['points']}`\n")
         
         # Clear bets for the next round
-        users[user_id]["bets"] = {}
+        data["bets"] = {}
+        data["total_bet"] = 0
+
+    if not active_count:
+        await update.message.reply_text(NO_BETS_MSG)
+        return
 
-    await update.message.reply_text(result_msg)
-    logger.info(f"Dice rolled: {total}. Results processed for {len(active_players)} players.")
+    invalidate_leaderboard()
+    await update.message.reply_text("".join(result_parts))
+    logger.info("Dice rolled: %s. Results processed for %s players.", total, active_count)
     
-    # Save data after every round
-    save_data()
+    # Save data after every round (batched by flush_data)
+    mark_dirty()
 
 async def show_score(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Show player's current score."""
@@ -250,8 +318,8 @@ async def show_score(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         return
 
     user_data = users[user_id]
-    wins = user_data.get('wins', 0)
-    losses = user_data.get('losses', 0)
+    wins = user_data['wins']
+    losses = user_data['losses']
     total_games = wins + losses
     
     # <<< FIX 4: Corrected win rate calculation
@@ -270,27 +338,28 @@ async def show_score(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
 
 async def show_leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Display the current leaderboard."""
-    # Update leaderboard from users dict to ensure it's current
-    current_leaderboard = {uid: data['points'] for uid, data in users.items()}
-
-    if not current_leaderboard:
+    global top_players
+    if not users:
         await update.message.reply_text("The leaderboard is empty. Play a round to get on it!")
         return
 
-    sorted_players = sorted(
-        current_leaderboard.items(),
-        key=lambda item: item[1],
-        reverse=True
-    )[:10]  # Top 10
+    # Rebuild the top 10 only when points changed since the last call
+    if top_players is None:
+        top_players = heapq.nlargest(
+            10,
+            ((uid, data['points']) for uid, data in users.items()),
+            key=lambda item: item[1]
+        )
+    sorted_players = top_players
 
-    leaderboard_msg = "🏆 **Top 10 Players** 🏆\n\n"
+    leaderboard_parts = ["🏆 **Top 10 Players** 🏆\n\n"]
     medals = ["🥇", "🥈", "🥉"]
     for rank, (user_id, points) in enumerate(sorted_players, 1):
-        username = users.get(user_id, {}).get("username", f"User_{user_id}")
+        username = users[user_id]["username"] # top_players is built from users, so the entry exists
         medal = medals[rank - 1] if rank <= 3 else f"{rank}."
-        leaderboard_msg += f"{medal} {username}: `{points}` points\n"
+        leaderboard_parts.append(f"{medal} {username}: `{points}` points\n")
 
-    await update.message.reply_text(leaderboard_msg)
+    await update.message.reply_text("".join(leaderboard_parts))
 
 async def adjust_score(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Admin command to adjust player scores."""
@@ -315,14 +384,15 @@ async def adjust_score(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         return
 
     users[target_id]["points"] += amount
+    invalidate_leaderboard()
     target_username = users[target_id]['username']
     
     await update.message.reply_text(
         f"✅ Score adjusted for **{target_username}** by `{amount}`.\n"
         f"New balance: `{users[target_id]['points']}`"
     )
-    logger.info(f"Admin {user_id} adjusted {target_id}'s score by {amount}.")
-    save_data()
+    logger.info("Admin %s adjusted %s's score by %s.", user_id, target_id, amount)
+    mark_dirty()
 
 def main() -> None:
     """Start the bot."""
@@ -334,7 +404,10 @@ def main() -> None:
     load_data()
 
     # <<< FIX 2: Use Application.builder() for modern setup
-    application = Application.builder().token(TOKEN).build()
+    application = Application.builder().token(TOKEN).post_shutdown(flush_on_shutdown).build()
+
+    # Periodically flush pending game state instead of writing after every command
+    application.job_queue.run_repeating(flush_data, interval=SAVE_INTERVAL)
 
     # Command handlers
     application.add_handler(CommandHandler("start", start))
@@ -1,8 +1,9 @@
 import logging
+from dataclasses import dataclass
 from datetime import datetime
-import random
+from itertools import count
 
-from constants import global_data, INITIAL_PLAYER_SCORE
+from constants import INITIAL_PLAYER_SCORE, get_chat_data_for_id, escape_markdown, index_username
 
 logger = logging.getLogger(__name__)
 
@@ -11,14 +12,89 @@ WAITING_FOR_BETS = "WAITING_FOR_BETS"
 GAME_CLOSED = "GAME_CLOSED"
 GAME_OVER = "GAME_OVER"
 
+# Bet types in bucket order; BET_TYPE_INDEX maps each type to its position in DiceGame.bet_buckets
+BET_TYPES = ("big", "small", "lucky")
+BET_TYPE_INDEX = {"big": 0, "small": 1, "lucky": 2}
+
+# (winning_type, multiplier) for each possible sum of two dice, indexed directly by the result (0-12)
+_SMALL, _LUCKY, _BIG = ("small", 2.0), ("lucky", 5.0), ("big", 2.0)
+OUTCOME_BY_ROLL = (_SMALL,) * 7 + (_LUCKY,) + (_BIG,) * 5
+
+# Maximum number of finished DiceGame instances kept around for reuse
+MAX_POOLED_GAMES = 32
+
+def update_game_totals(player_stats: dict):
+    """
+    Refreshes the derived total_games and win_rate fields after a player's wins or losses change,
+    so the stats commands can read them instead of recomputing on every call.
+    """
+    total_games = player_stats["wins"] + player_stats["losses"]
+    player_stats["total_games"] = total_games
+    player_stats["win_rate"] = player_stats["wins"] / total_games * 100 if total_games else 0.0
+
+@dataclass
+class SequenceState:
+    """
+    Progress of a multi-match /startdice sequence, stored under a single chat_data key.
+    """
+    total: int # Number of matches requested
+    index: int = 0 # Number of matches started so far
+
 class DiceGame:
+    __slots__ = ("match_id", "chat_id", "state", "bets_big", "bets_small", "bets_lucky", "bet_buckets", "user_totals", "result", "bet_summary", "recent_presses", "chat_data", "player_stats", "token")
+
+    _pool = [] # Free list of released DiceGame instances, shared by all chats
+    _tokens = count(1) # Source of DiceGame.token values; never repeats within a process
+
     def __init__(self, match_id: int, chat_id: int):
         self.match_id = match_id
         self.chat_id = chat_id
         self.state = WAITING_FOR_BETS
-        self.bets = {"big": {}, "small": {}, "lucky": {}} # Stores bets: {"type": {user_id: amount}}
-        self.participants = set() # Stores user_ids of players who participated in this match
+        # Stores bets per type: {user_id: amount}
+        self.bets_big = {}
+        self.bets_small = {}
+        self.bets_lucky = {}
+        self.bet_buckets = (self.bets_big, self.bets_small, self.bets_lucky) # Indexed by BET_TYPE_INDEX, ordered as BET_TYPES
+        self.user_totals = {} # Running total of each player's bets across all types: {user_id: amount}; its keys are the match's participants
         self.result = None # Stores the dice roll result (sum of two dice)
+        self.bet_summary = None # Bets-closed summary text, announced together with the results
+        self.recent_presses = {} # (user_id, callback_data) -> time.monotonic() of the last accepted button press
+        self.chat_data = get_chat_data_for_id(chat_id) # Cached chat-specific data for this match
+        self.player_stats = self.chat_data["player_stats"] # Cached player_stats for this chat
+        self.token = next(DiceGame._tokens) # Identifies this round; unlike match_id it is never reused by a restarted counter or a pooled instance
+
+    @classmethod
+    def acquire(cls, match_id: int, chat_id: int) -> "DiceGame":
+        """
+        Returns a recycled DiceGame from the pool (or a new one if the pool is empty),
+        ready to accept bets for the given match.
+        """
+        if not cls._pool:
+            return cls(match_id, chat_id)
+        game = cls._pool.pop()
+        game.match_id = match_id
+        game.chat_id = chat_id
+        game.state = WAITING_FOR_BETS
+        game.chat_data = get_chat_data_for_id(chat_id)
+        game.player_stats = game.chat_data["player_stats"]
+        game.token = next(cls._tokens)
+        return game
+
+    def release(self):
+        """
+        Clears this finished game's containers in place and returns it to the pool.
+        Must only be called once nothing (chat_data, scheduled jobs) still refers to the game.
+        """
+        if len(DiceGame._pool) >= MAX_POOLED_GAMES:
+            return
+        self.bets_big.clear()
+        self.bets_small.clear()
+        self.bets_lucky.clear()
+        self.user_totals.clear()
+        self.recent_presses.clear()
+        self.result = None
+        self.bet_summary = None
+        DiceGame._pool.append(self)
 
     def place_bet(self, user_id: int, username: str, bet_type: str, amount: int) -> tuple[bool, str]:
         """
@@ -34,8 +110,9 @@ class DiceGame:
             tuple[bool, str]: A tuple indicating success (True/False) and a
                               response message for the player.
         """
-        # Ensure bet type is valid
-        if bet_type not in ["big", "small", "lucky"]:
+        # Ensure bet type is valid (the same lookup selects the bet bucket below)
+        bucket_idx = BET_TYPE_INDEX.get(bet_type)
+        if bucket_idx is None:
             logger.warning(f"place_bet: Invalid bet type '{bet_type}' from user {user_id}.")
             return False, "❌ လောင်းကြေးအမျိုးအစားက မှားနေတယ်ရှင့်။ 'big', 'small' ဒါမှမဟုတ် 'lucky' ထဲက တစ်ခုခုဖြစ်ရမယ်နော်။" # Feminine invalid bet type
 
@@ -44,48 +121,60 @@ class DiceGame:
             logger.warning(f"place_bet: Invalid bet amount '{amount}' from user {user_id}.")
             return False, "❌ လောင်းကြေးပမာဏက အပေါင်းကိန်းဖြစ်ရမယ်နော်။ ၀ ဒါမှမဟုတ် အနုတ် မရပါဘူးရှင့်။" # Feminine invalid amount
 
+        username_escaped = escape_markdown(username) # Replies are sent with parse_mode="Markdown"
+
         # Ensure game is in betting phase
         if self.state != WAITING_FOR_BETS:
-            logger.info(f"place_bet: User {user_id} tried to bet when betting is closed for match {self.match_id}. State: {self.state}")
-            return False, f"⚠️ @{username} ရေ၊ ဒီဂိမ်းအတွက် လောင်းကြေးတွေ ပိတ်လိုက်ပြီနော်။ နောက်ပွဲကျမှ ပြန်လာခဲ့ပါဦး!" # Feminine closed bets
+            logger.info("place_bet: User %s tried to bet when betting is closed for match %s. State: %s", user_id, self.match_id, self.state)
+            return False, f"⚠️ @{username_escaped} ရေ၊ ဒီဂိမ်းအတွက် လောင်းကြေးတွေ ပိတ်လိုက်ပြီနော်။ နောက်ပွဲကျမှ ပြန်လာခဲ့ပါဦး!" # Feminine closed bets
+
+        now = datetime.now() # One timestamp for the whole bet
 
         # Get or initialize player stats for this chat
-        chat_data = global_data["all_chat_data"].setdefault(self.chat_id, {
-            "player_stats": {},
-            "match_counter": 1,
-            "match_history": [],
-            "group_admins": []
-        })
-        player_stats = chat_data["player_stats"].setdefault(user_id, {
-            "username": username,
-            "score": INITIAL_PLAYER_SCORE,
-            "wins": 0,
-            "losses": 0,
-            "last_active": datetime.now()
-        })
-
-        # Update username in case it changed since last interaction
-        player_stats["username"] = username 
-        player_stats["last_active"] = datetime.now() # Update last active time
+        player_stats = self.player_stats.get(user_id)
+        if player_stats is None:
+            player_stats = self.player_stats[user_id] = {
+                "username": username,
+                "username_md": username_escaped, # Markdown-escaped username, stored so displays don't re-escape it
+                "score": INITIAL_PLAYER_SCORE,
+                "wins": 0,
+                "losses": 0,
+                "total_games": 0, # wins + losses, kept in step by update_game_totals()
+                "win_rate": 0.0, # Percentage of total_games won
+                "is_active": False, # Set once the player has bet or had their score adjusted; shown on /leaderboard
+                "last_active": now
+            }
+            index_username(self.chat_data, user_id, None, username)
+        elif player_stats["username"] != username:
+            # Update username in case it changed since last interaction
+            index_username(self.chat_data, user_id, player_stats["username"], username)
+            player_stats["username"] = username
+            player_stats["username_md"] = username_escaped
+            self.chat_data["leaderboard_text"] = None # The cached /leaderboard shows the old name, even if this bet is rejected below
+        player_stats["last_active"] = now # Update last active time
 
         # Check if player has enough score
-        if player_stats["score"] < amount:
-            logger.info(f"place_bet: User {user_id} ({username}) tried to bet {amount} but only has {player_stats['score']}.")
+        player_score = player_stats["score"]
+        if player_score < amount:
+            logger.info("place_bet: User %s (%s) tried to bet %s but only has %s.", user_id, username, amount, player_score)
             # Corrected line as per user's request
-            return False, f"❌ @{username} ရေ၊ ရမှတ်မလုံလောက်ပါဘူးရှင့်။ သင့်မှာ *{player_stats['score']}* မှတ်ပဲရှိသေးတာနော်။" # Feminine, casual, direct
+            return False, f"❌ @{username_escaped} ရေ၊ ရမှတ်မလုံလောက်ပါဘူးရှင့်။ သင့်မှာ *{player_score}* မှတ်ပဲရှိသေးတာနော်။" # Feminine, casual, direct
 
         # Deduct bet amount from player's score
-        player_stats["score"] -= amount
+        player_score -= amount
+        player_stats["score"] = player_score
+        player_stats["is_active"] = True
+        self.chat_data["leaderboard_text"] = None # Scores changed; /leaderboard re-renders on next use
         
         # Add bet to the game's bets
         # Aggregate bets if the user bets multiple times on the same type
-        current_bet_amount_on_type = self.bets[bet_type].get(user_id, 0)
-        self.bets[bet_type][user_id] = current_bet_amount_on_type + amount
+        bucket = self.bet_buckets[bucket_idx]
+        bucket[user_id] = bucket.get(user_id, 0) + amount
         
-        self.participants.add(user_id) # Add player to participants set
+        self.user_totals[user_id] = self.user_totals.get(user_id, 0) + amount # Also records the player as a participant
 
-        logger.info(f"place_bet: User {user_id} ({username}) placed {amount} on {bet_type}. Remaining score: {player_stats['score']}.")
-        return True, f"✅ @{username} ရေ၊ *{amount}* မှတ်ကို *{bet_type.upper()}* ပေါ် လောင်းလိုက်ပြီနော်။ လက်ကျန်ရမှတ်: *{player_stats['score']}* မှတ်ရှိပါသေးတယ်!" # Feminine, casual confirmation
+        logger.info("place_bet: User %s (%s) placed %s on %s. Remaining score: %s.", user_id, username, amount, bet_type, player_score)
+        return True, f"✅ @{username_escaped} ရေ၊ *{amount}* မှတ်ကို *{bet_type.upper()}* ပေါ် လောင်းလိုက်ပြီနော်။ လက်ကျန်ရမှတ်: *{player_score}* မှတ်ရှိပါသေးတယ်!" # Feminine, casual confirmation
 
 
     def payout(self, chat_id: int) -> tuple[str, float, dict]:
@@ -100,66 +189,58 @@ class DiceGame:
                                      its multiplier, and a dictionary of
                                      {user_id: winnings} for all winning players.
         """
-        winning_type = ""
-        multiplier = 0.0
-
         if self.result is None:
             logger.error(f"payout: Attempted to payout for match {self.match_id} in chat {chat_id} but result is None.")
             return "error", 0.0, {}
 
         # Determine winning type and multiplier
-        if self.result > 7:
-            winning_type = "big"
-            multiplier = 2.0
-        elif self.result < 7:
-            winning_type = "small"
-            multiplier = 2.0
-        else: # self.result == 7
-            winning_type = "lucky"
-            multiplier = 5.0
+        winning_type, multiplier = OUTCOME_BY_ROLL[self.result]
         
-        logger.info(f"payout: Match {self.match_id} result is {self.result}. Winning type: {winning_type}, Multiplier: {multiplier}.")
+        logger.info("payout: Match %s result is %s. Winning type: %s, Multiplier: %s.", self.match_id, self.result, winning_type, multiplier)
+
+        now = datetime.now() # One timestamp shared by every player and the history entry of this match
 
         # Get player stats for this chat
-        chat_data = global_data["all_chat_data"].setdefault(chat_id, {
-            "player_stats": {},
-            "match_counter": 1,
-            "match_history": [],
-            "group_admins": []
-        })
-        player_stats_for_chat = chat_data["player_stats"]
+        chat_data = self.chat_data
+        player_stats_for_chat = self.player_stats
         
         individual_payouts = {}
-        winning_bets = self.bets.get(winning_type, {})
+        log_players = logger.isEnabledFor(logging.INFO) # Checked once instead of per player
+        winning_bets = self.bet_buckets[BET_TYPE_INDEX[winning_type]]
 
         for user_id, amount_bet in winning_bets.items():
-            if user_id in player_stats_for_chat:
+            player_stats = player_stats_for_chat.get(user_id) # Single lookup per player
+            if player_stats is not None:
                 winnings = int(amount_bet * multiplier)
-                player_stats_for_chat[user_id]["score"] += winnings
-                player_stats_for_chat[user_id]["wins"] += 1
-                player_stats_for_chat[user_id]["last_active"] = datetime.now()
+                player_stats["score"] += winnings
+                player_stats["wins"] += 1
+                update_game_totals(player_stats)
+                player_stats["last_active"] = now
                 individual_payouts[user_id] = winnings
-                logger.info(f"payout: User {user_id} won {winnings} in match {self.match_id}. New score: {player_stats_for_chat[user_id]['score']}.")
+                if log_players:
+                    logger.info("payout: User %s won %s in match %s. New score: %s.", user_id, winnings, self.match_id, player_stats['score'])
             else:
                 logger.warning(f"payout: Winning user {user_id} not found in player_stats_for_chat during payout for match {self.match_id}.")
         
         # Update losses for non-winning participants
-        for user_id in self.participants:
-            if user_id not in winning_bets and user_id in player_stats_for_chat:
-                player_stats_for_chat[user_id]["losses"] += 1
-                player_stats_for_chat[user_id]["last_active"] = datetime.now()
-                logger.info(f"payout: User {user_id} lost in match {self.match_id}.")
+        for user_id in self.user_totals.keys() - winning_bets.keys():
+            player_stats = player_stats_for_chat.get(user_id)
+            if player_stats is not None:
+                player_stats["losses"] += 1
+                update_game_totals(player_stats)
+                player_stats["last_active"] = now
+                if log_players:
+                    logger.info("payout: User %s lost in match %s.", user_id, self.match_id)
+
+        chat_data["leaderboard_text"] = None # Scores, wins and losses changed
 
         # Record match history
         chat_data["match_history"].append({
             "match_id": self.match_id,
             "result": self.result,
             "winner": winning_type,
-            "participants": len(self.participants),
-            "timestamp": datetime.now()
-        })
-        # Keep history list to a manageable size, e.g., last 20 matches
-        if len(chat_data["match_history"]) > 20:
-            chat_data["match_history"] = chat_data["match_history"][-20:]
+            "participants": len(self.user_totals),
+            "timestamp": now
+        }) # match_history is a deque(maxlen=20), so the oldest entry drops off automatically
 
         return winning_type, multiplier, individual_payouts
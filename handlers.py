@@ -1,53 +1,229 @@
 import logging
 import asyncio # For async.sleep
+import heapq # For picking the leaderboard's top players
+import time # For the admin-fetch TTL
 from datetime import datetime
-import random # For random.randint fallback in dice roll
+from random import randrange as _randrange # For the fallback dice roll; randrange(1, 7) skips randint's extra call layer
 import re # Import the 're' module for regex operations
+from itertools import islice # For taking the newest entries of match_history
+from operator import itemgetter # Sort key for bet dicts
 from typing import Optional # Import Optional for type hinting
 from apscheduler.jobstores.base import JobLookupError # Import JobLookupError for error handling
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
-from telegram.ext import ContextTypes # Only ContextTypes is needed here from telegram.ext
+from telegram.ext import ContextTypes, ApplicationHandlerStop
 
 # Import necessary components from other modules
-from game_logic import DiceGame, WAITING_FOR_BETS, GAME_CLOSED, GAME_OVER
-from constants import global_data, HARDCODED_ADMINS, RESULT_EMOJIS, INITIAL_PLAYER_SCORE, ALLOWED_GROUP_IDS, get_chat_data_for_id
+from game_logic import DiceGame, SequenceState, WAITING_FOR_BETS, GAME_CLOSED, GAME_OVER, BET_TYPES
+from constants import global_data, HARDCODED_ADMINS, RESULT_EMOJIS, INITIAL_PLAYER_SCORE, BUTTON_BET_AMOUNT, ALLOWED_GROUP_IDS, get_chat_data_for_id, escape_markdown, index_username, find_user_by_username
 
 
 # Configure logging for this module (this will be overridden by main.py's config)
 logger = logging.getLogger(__name__)
 
+# Simplified regex for single text bets (e.g. 'big 500', 's100'); compiled once and shared with main.py's filters.
+# Amounts are capped at 9 digits so oversized numbers are dropped as non-bet text before any int() parse.
+BET_REGEX = re.compile(r"^(big|b|small|s|lucky|l)\s*(\d{1,9})$", re.IGNORECASE)
+
+# Maps every bet alias accepted by BET_REGEX (lowercased) to its bet type
+BET_TYPE_ALIASES = {
+    "b": "big", "big": "big",
+    "s": "small", "small": "small",
+    "l": "lucky", "lucky": "lucky"
+}
+
+# Number of seconds a successfully fetched admin list is reused before a non-forced check fetches it again
+ADMIN_FETCH_TTL = 30
+_admin_fetch_times = {} # chat_id -> time.monotonic() of the last successful admin fetch
+ADMIN_STATUSES = frozenset({"administrator", "creator"}) # ChatMember statuses that count as group admins
+
+# How long a fetched chat member's display name is reused by /adjustscore and /checkscore
+MEMBER_NAME_TTL = 60
+_member_names = {} # (chat_id, user_id) -> (time.monotonic() of the fetch, display name)
+
+# Maps the betting buttons' callback_data to their bet type
+CALLBACK_BET_TYPES = {"bet_big": "big", "bet_small": "small", "bet_lucky": "lucky"}
+
+# Seconds within which a second press of the same bet button by the same user is treated as an accidental double tap
+BUTTON_PRESS_WINDOW = 0.5
+
+# Sort key picking the amount out of (user_id, amount) pairs; avoids a Python-level lambda call per item
+_BY_AMOUNT = itemgetter(1)
+
+# Bet-summary heading for each bet type, ordered as BET_TYPES (and so as DiceGame.bet_buckets)
+BET_SUMMARY_HEADINGS = tuple(f"  *{bet_type.upper()}* {RESULT_EMOJIS[bet_type]}:" for bet_type in BET_TYPES)
+
+# Static texts, built once at import instead of on every /start and every new round
+START_TEXT = (
+    "🌟🎲 *အန်စာတုံးဂိမ်း ကမ္ဘာလေးထဲကို ကြိုဆိုပါတယ်ရှင့်!* 🎉🌟\n\n" # Feminine welcome
+    "ကဲ.. ကံစမ်းမလားဟင်? စွန့်စားခန်းတွေ စလိုက်ရအောင်! ဂိမ်းစည်းမျဉ်းလေးတွေက ဒီလိုပါရှင့်:\n\n" # Feminine intro
+    "✨ *ဂိမ်းစည်းမျဉ်းလေးတွေ:* အန်စာတုံး ၂ လုံးလှိမ့်မယ်နော်။ အဲ့ဒီရလဒ်ကို ခန့်မှန်းရမှာပေါ့!\n"
+    "  - *BIG* 🔼: ၇ ထက်ကြီးတယ် (လောင်းတဲ့ပမာဏရဲ့ ၂ ဆ ပြန်ရမယ်နော်!)\n"
+    "  - *SMALL* 🔽: ၇ ထက်ငယ်တယ် (ဒါလည်း ၂ ဆပဲ ပြန်ရမှာနော်!)\n"
+    "  - *LUCKY* 🍀: ၇ အတိအကျ (ကဲ ဒါကတော့ ၅ ဆတောင် ပြန်ရမှာ!)\n\n"
+    "💰 *ဘယ်လိုလောင်းမလဲ:*\n"
+    "  - လောင်းကြေးထပ်ချိန် (မူရင်း ၁၀၀ မှတ်ပဲ ရှိသေးတယ်နော်) အတွင်း ခလုတ်လေးတွေကို နှိပ်ပြီး လောင်းလို့ရတယ်။\n"
+    "  - ဒါမှမဟုတ် ကိုယ်တိုင်ရိုက်ပြီး လောင်းမလား?: `/b <ပမာဏ>`, `/s <ပမာဏ>`, `/l <ပမာဏ>`\n"
+    "    (ဥပမာ: `big 500`, `small100`, `lucky 250` စသည်ဖြင့်ပေါ့!)\n"
+    "  _ပွဲတစ်ပွဲတည်းမှာ မတူညီတဲ့ ရလဒ်တွေပေါ် အကြိမ်ပေါင်းများစွာ လောင်းကြေးထပ်လို့ရတယ်နော်။_ \n\n"
+    "📊 *သုံးလို့ရတဲ့ အမိန့်တွေ:*\n"
+    "  - /score: ကိုယ့်မှာ လက်ရှိ ဘယ်နှစ်မှတ်ရှိလဲ ကြည့်ရအောင်!\n"
+    "  - /stats: ကိုယ့်ရဲ့ ဂိမ်းမှတ်တမ်း အသေးစိတ်လေးတွေ ကြည့်ဖို့ပေါ့။\n"
+    "  - /leaderboard: ဒီ Chat ထဲက အမှတ်အများဆုံး ထိပ်တန်း ကစားသမားတွေ ဘယ်သူတွေလဲ ကြည့်ရအောင်!\n"
+    "  - /history: မကြာသေးခင်က ပွဲစဉ်ရလဒ်လေးတွေ ပြန်ကြည့်ဖို့ပါ။\n\n"
+    "👑 *Admin တွေအတွက်ပဲနော်:*\n"
+    "  - /startdice: အန်စာတုံးလောင်းကြေးပွဲ အသစ်လေး စတင်လိုက်ရအောင်!\n"
+    "  - /adjustscore <user\\_id> <amount>: ကစားသမားတစ်ယောက်ရဲ့ မှတ်တွေကို ထည့်တာ/နှုတ်တာ လုပ်လို့ရတယ်။\n"
+    "  - /checkscore <user\\_id or @username>: ကစားသမားတစ်ယောက်ရဲ့ မှတ်တွေနဲ့ အချက်အလက်တွေ စစ်ဆေးကြည့်ဖို့ပေါ့။\n\n"
+    "ကဲ... ကံတရားက သင့်ဘက်မှာ အမြဲရှိပါစေရှင့်! 😉" # Feminine, casual tone
+)
+
+# Replies for chats outside ALLOWED_GROUP_IDS; NOT_AUTHORIZED_TEXT takes the chat_id
+NOT_AUTHORIZED_TEXT = "Sorry, this bot is not authorized to run in this group ({chat_id})."
+NOT_AUTHORIZED_HINT = " Please add it to an allowed group."
+
+# Commands registered with a CommandHandler in main.py; only these get the not-authorized reply
+REGISTERED_COMMANDS = frozenset({
+    "start", "startdice", "score", "stats", "mystats", "leaderboard",
+    "history", "adjustscore", "checkscore", "refreshadmins", "stop"
+})
+
+# Usage help sent when /adjustscore or /checkscore is called with the wrong arguments
+ADJUST_SCORE_USAGE = (
+    "❌ သုံးတဲ့ပုံစံလေး မှားနေတယ်နော်။ ကျေးဇူးပြုပြီး အောက်က ပုံစံတွေထဲက တစ်ခုခုကို သုံးပေးပါ:\n" # Feminine, casual invalid usage
+    "  - အသုံးပြုသူရဲ့ မက်ဆေ့ချ်ကို ပြန်ဖြေပြီး: `/adjustscore <ပမာဏ>`\n"
+    "  - တိုက်ရိုက်ရိုက်ထည့်ချင်ရင်: `/adjustscore <user_id>`\n"
+    "  - Username နဲ့ ရိုက်ထည့်ချင်ရင်: `/adjustscore @username <ပမာဏ>`\n"
+    "ဥပမာ- `/adjustscore 123456789 500` ဒါမှမဟုတ် `/adjustscore @someuser 100`။"
+)
+CHECK_SCORE_USAGE = (
+    "❌ သုံးတဲ့ပုံစံလေး မှားနေတယ်နော်။ ကျေးဇူးပြုပြီး အောက်က ပုံစံတွေထဲက တစ်ခုခုကို သုံးပေးပါ:\n" # Feminine, casual invalid usage
+    "  - အသုံးပြုသူရဲ့ မက်ဆေ့ချ်ကို ပြန်ဖြေပြီး: `/checkscore`\n"
+    "  - တိုက်ရိုက်ရိုက်ထည့်ချင်ရင်: `/checkscore <user_id>`\n"
+    "  - Username နဲ့ ရိုက်ထည့်ချင်ရင်: `/checkscore @username`\n"
+    "ဥပမာ- `/checkscore 123456789` ဒါမှမဟုတ် `/checkscore @someuser`။"
+)
+
+# Betting buttons attached to every round-open message; PTB markup objects are immutable, so one instance is shared
+BET_KEYBOARD = InlineKeyboardMarkup([
+    [
+        InlineKeyboardButton("BIG 🔼 (Total > 7)", callback_data="bet_big"),
+        InlineKeyboardButton("SMALL 🔽 (Total < 7)", callback_data="bet_small"),
+        InlineKeyboardButton("LUCKY 🍀 (Total = 7)", callback_data="bet_lucky")
+    ]
+])
+
+ROUND_OPEN_PREFIX = "🔥 *ပွဲစဉ် #"
+ROUND_OPEN_SUFFIX = (
+    ": လောင်းကြေးတွေ ဖွင့်လိုက်ပါပြီရှင်!* 🔥 \n\n" # Feminine, exciting intro
+    "💰 BIG (>7), SMALL (<7), ဒါမှမဟုတ် LUCKY (အတိအကျ 7) တို့ပေါ် လောင်းကြေးထပ်လိုက်ပါနော်။\n" # Feminine instructions
+    "ခလုတ်တွေ နှိပ်ပြီး လောင်းမလား (မူရင်း ၁၀၀ မှတ်)! ဒါမှမဟုတ် `big 250`, `s 50`, `lucky100` စသည်ဖြင့် ရိုက်ပြီး လောင်းမလား!?\n"
+    "_ပွဲတစ်ပွဲတည်းမှာ မတူညီတဲ့ ရလဒ်တွေပေါ် အကြိမ်ပေါင်းများစွာ လောင်းကြေးထပ်လို့ရတယ်နော်။_ \n\n"
+    "⏳ လောင်းကြေးတွေကို *စက္ကန့် ၆၀* အတွင်း ပိတ်တော့မယ်နော်! မြန်မြန်လေး... ကံကြမ္မာက သင့်ကိုစောင့်နေတယ်။ ကံကောင်းပါစေရှင့်! ✨" # Feminine, casual, urgent
+)
+
+
+async def allowed_group_gate(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Runs before every other handler (registered in group -1) and stops dispatch
+    for updates coming from chats that are not in ALLOWED_GROUP_IDS.
+    """
+    chat = update.effective_chat
+    if chat is None or chat.id in ALLOWED_GROUP_IDS:
+        return
+
+    logger.info("allowed_group_gate: Ignoring update from disallowed chat ID: %s", chat.id)
+    if update.callback_query:
+        await update.callback_query.answer(NOT_AUTHORIZED_TEXT.format(chat_id=chat.id), show_alert=True)
+    elif update.message and update.message.text and update.message.text.startswith("/"):
+        # Only answer our own commands, not unknown ones or commands addressed to other bots (/help@OtherBot)
+        command, _, addressee = update.message.text.split(maxsplit=1)[0][1:].partition("@")
+        if command.lower() in REGISTERED_COMMANDS and (not addressee or addressee.lower() == context.bot.username.lower()):
+            await update.message.reply_text(NOT_AUTHORIZED_TEXT.format(chat_id=chat.id) + NOT_AUTHORIZED_HINT, parse_mode="Markdown")
+    # Other updates (plain text, other commands, chat member changes) are dropped silently
+    raise ApplicationHandlerStop
+
+
+def format_last_active(player_stats: dict) -> str:
+    """
+    Returns the player's last_active time formatted for display. The formatted string is kept
+    on the stats dict alongside the datetime it came from and reused until last_active changes.
+    """
+    last_active = player_stats["last_active"]
+    cached = player_stats.get("last_active_display")
+    if cached is None or cached[0] is not last_active:
+        cached = player_stats["last_active_display"] = (last_active, last_active.strftime('%Y-%m-%d %H:%M'))
+    return cached[1]
+
+
+def format_history_line(match: dict) -> str:
+    """
+    Returns the /history line for a match_history entry. Entries never change once recorded,
+    so the line is rendered on first use and kept on the entry.
+    """
+    line = match.get("line")
+    if line is None:
+        line = match["line"] = f"  • ပွဲစဉ် #{match['match_id']} | ရလဒ်: *{match['result']}* ({match['winner'].upper()} {RESULT_EMOJIS.get(match['winner'], '')}) | ပါဝင်ကစားသူ: *{match['participants']}* ယောက် | အချိန်: {match['timestamp'].strftime('%Y-%m-%d %H:%M')}" # Feminine, casual details
+    return line
+
 
 def is_admin(chat_id, user_id):
     """
     Checks if a user is an administrator in a specific chat
     or if they are one of the hardcoded global administrators.
     """
-    chat_specific_data = get_chat_data_for_id(chat_id)
-    is_chat_admin = user_id in chat_specific_data["group_admins"]
-    is_hardcoded_admin = user_id in HARDCODED_ADMINS
-    logger.debug(f"is_admin: Checking admin status for user {user_id} in chat {chat_id}: is_chat_admin={is_chat_admin}, is_hardcoded_admin={is_hardcoded_admin}")
-    return is_chat_admin or is_hardcoded_admin
+    group_admins = get_chat_data_for_id(chat_id)["group_admins"]
+    if logger.isEnabledFor(logging.DEBUG): # Both flags are only worked out separately for the debug log
+        logger.debug("is_admin: Checking admin status for user %s in chat %s: is_chat_admin=%s, is_hardcoded_admin=%s", user_id, chat_id, user_id in group_admins, user_id in HARDCODED_ADMINS)
+    return user_id in HARDCODED_ADMINS or user_id in group_admins
 
-async def update_group_admins(chat_id: int, context: ContextTypes.DEFAULT_TYPE) -> bool:
+async def update_group_admins(chat_id: int, context: ContextTypes.DEFAULT_TYPE, force: bool = False) -> bool:
     """
     Fetches the current list of administrators for a given chat
     and updates the global_data storage.
+    Unless force is set, a chat successfully fetched less than ADMIN_FETCH_TTL seconds ago is
+    not fetched again and the cached list decides the result. Failed fetches are not rate-limited.
     Returns True on success, False on failure.
     """
+    chat_specific_data = get_chat_data_for_id(chat_id)
+    now = time.monotonic()
+    if not force and now - _admin_fetch_times.get(chat_id, float("-inf")) < ADMIN_FETCH_TTL:
+        logger.debug("update_group_admins: Reusing admin list fetched less than %ss ago for chat %s.", ADMIN_FETCH_TTL, chat_id)
+        return bool(chat_specific_data["group_admins"])
+
     try:
         admins = await context.bot.get_chat_administrators(chat_id)
-        admin_ids = [admin.user.id for admin in admins]
+        admin_ids = {admin.user.id for admin in admins}
         
-        chat_specific_data = get_chat_data_for_id(chat_id)
-        chat_specific_data["group_admins"] = admin_ids # Update chat-specific admin list
+        chat_specific_data["group_admins"] = admin_ids # Update chat-specific admin set
+        _admin_fetch_times[chat_id] = now # Only a successful fetch starts the TTL, so a transient failure can be retried at once
         
-        logger.info(f"update_group_admins: Updated admin list for chat {chat_id}: {admin_ids}")
+        logger.info("update_group_admins: Updated admin list for chat %s: %s", chat_id, admin_ids)
         return True
     except Exception as e:
         logger.error(f"update_group_admins: Failed to get chat administrators for chat {chat_id}: {e}")
         return False
 
+async def fetch_member_name(chat_id: int, user_id: int, context: ContextTypes.DEFAULT_TYPE) -> str:
+    """
+    Returns a chat member's username (or first name), reusing a lookup made in the last
+    MEMBER_NAME_TTL seconds instead of calling getChatMember again.
+    Raises whatever get_chat_member raises when the user can't be fetched.
+    """
+    key = (chat_id, user_id)
+    now = time.monotonic()
+    cached = _member_names.get(key)
+    if cached is not None and now - cached[0] < MEMBER_NAME_TTL:
+        return cached[1]
+
+    chat_member = await context.bot.get_chat_member(chat_id, user_id)
+    name = chat_member.user.username or chat_member.user.first_name
+    if len(_member_names) >= 1024: # Keep the cache small; expired entries are only useful as misses
+        for stale_key in [k for k, (fetched_at, _) in _member_names.items() if now - fetched_at >= MEMBER_NAME_TTL]:
+            del _member_names[stale_key]
+    _member_names[key] = (now, name)
+    return name
+
 async def on_chat_member_update(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Handles updates related to chat members, specifically when the bot
@@ -57,21 +233,13 @@ async def on_chat_member_update(update: Update, context: ContextTypes.DEFAULT_TY
     if not chat_member_update:
         return
 
-    # --- Group ID check for chat member updates ---
-    if update.effective_chat.id not in ALLOWED_GROUP_IDS:
-        logger.info(f"on_chat_member_update: Ignoring update from disallowed chat ID: {update.effective_chat.id}")
-        # Optionally, send a message to the user/group that the bot is not authorized here.
-        # await context.bot.send_message(update.effective_chat.id, "This bot is not authorized to run in this group.")
-        return
-    # --- END Group ID check ---
-
     if chat_member_update.new_chat_member.user.id == context.bot.id:
         chat_id = chat_member_update.chat.id
         new_status = chat_member_update.new_chat_member.status
 
         if new_status in ("member", "administrator"):
-            logger.info(f"on_chat_member_update: Bot was added to chat {chat_id} or its status changed. New status: {new_status}.")
-            if await update_group_admins(chat_id, context):
+            logger.info("on_chat_member_update: Bot was added to chat %s or its status changed. New status: %s.", chat_id, new_status)
+            if await update_group_admins(chat_id, context, force=True):
                 await context.bot.send_message(
                     chat_id,
                     "🎉 *အန်စာတုံးဂိမ်း ကမ္ဘာလေးထဲကို ကြိုဆိုပါတယ်ရှင့်!* 🎉\n" # Feminine welcome
@@ -85,14 +253,46 @@ async def on_chat_member_update(update: Update, context: ContextTypes.DEFAULT_TY
                     parse_mode="Markdown"
                 )
         elif new_status == "left":
-            logger.info(f"on_chat_member_update: Bot was removed from chat {chat_id}.")
+            logger.info("on_chat_member_update: Bot was removed from chat %s.", chat_id)
+            _admin_fetch_times.pop(chat_id, None)
+            for member_key in [key for key in _member_names if key[0] == chat_id]: # Cached member names for this chat
+                del _member_names[member_key]
+            # Cancel this chat's pending game jobs first: a stale job could otherwise act on a game
+            # started after the bot is re-added, once match ids restart from 1
+            for job_key in ("close_bets_job", "roll_and_announce_job", "next_game_job"):
+                job = context.chat_data.pop(job_key, None)
+                if job:
+                    try:
+                        job.schedule_removal()
+                        logger.info("on_chat_member_update: Canceled job '%s' (%s) for chat %s.", job.name, job_key, chat_id)
+                    except JobLookupError:
+                        logger.warning(f"on_chat_member_update: Job '{job_key}' for chat {chat_id} was already removed. Continuing.")
             # Clean up all chat-specific data when the bot is removed from the group
             if chat_id in global_data["all_chat_data"]:
                 del global_data["all_chat_data"][chat_id]
-                logger.info(f"on_chat_member_update: Cleaned all_chat_data for chat {chat_id}.")
-            if chat_id in context.chat_data:
-                del context.chat_data[chat_id]
-                logger.info(f"on_chat_member_update: Cleaned context.chat_data for chat {chat_id}.")
+                logger.info("on_chat_member_update: Cleaned all_chat_data for chat %s.", chat_id)
+            if context.chat_data: # PTB already scopes context.chat_data to this chat
+                context.chat_data.clear()
+                logger.info("on_chat_member_update: Cleaned context.chat_data for chat %s.", chat_id)
+    else:
+        # Another member was promoted or demoted: patch the cached admin set instead of refetching it
+        chat_id = chat_member_update.chat.id
+        was_admin = chat_member_update.old_chat_member.status in ADMIN_STATUSES
+        is_now_admin = chat_member_update.new_chat_member.status in ADMIN_STATUSES
+        if was_admin != is_now_admin:
+            user_id = chat_member_update.new_chat_member.user.id
+            group_admins = get_chat_data_for_id(chat_id)["group_admins"]
+            if chat_id not in _admin_fetch_times or not group_admins:
+                # The full list was never loaded; a partial set would stop start_dice from fetching it,
+                # so leave it empty and let the next admin check do a full fetch straight away
+                _admin_fetch_times.pop(chat_id, None)
+                logger.info("on_chat_member_update: Admin list for chat %s not loaded yet; ignoring status change of user %s.", chat_id, user_id)
+                return
+            if is_now_admin:
+                group_admins.add(user_id)
+            else:
+                group_admins.discard(user_id)
+            logger.info("on_chat_member_update: Admin status of user %s in chat %s changed to %s.", user_id, chat_id, is_now_admin)
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -100,40 +300,10 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     and instructions to the user.
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"start: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-    # --- END Group ID check ---
-
     user_id = update.effective_user.id
-    logger.info(f"start: Received /start command from user {user_id} in chat {chat_id}")
+    logger.info("start: Received /start command from user %s in chat %s", user_id, chat_id)
 
-    await update.message.reply_text(
-        "🌟🎲 *အန်စာတုံးဂိမ်း ကမ္ဘာလေးထဲကို ကြိုဆိုပါတယ်ရှင့်!* 🎉🌟\n\n" # Feminine welcome
-        "ကဲ.. ကံစမ်းမလားဟင်? စွန့်စားခန်းတွေ စလိုက်ရအောင်! ဂိမ်းစည်းမျဉ်းလေးတွေက ဒီလိုပါရှင့်:\n\n" # Feminine intro
-        "✨ *ဂိမ်းစည်းမျဉ်းလေးတွေ:* အန်စာတုံး ၂ လုံးလှိမ့်မယ်နော်။ အဲ့ဒီရလဒ်ကို ခန့်မှန်းရမှာပေါ့!\n"
-        "  - *BIG* 🔼: ၇ ထက်ကြီးတယ် (လောင်းတဲ့ပမာဏရဲ့ ၂ ဆ ပြန်ရမယ်နော်!)\n"
-        "  - *SMALL* 🔽: ၇ ထက်ငယ်တယ် (ဒါလည်း ၂ ဆပဲ ပြန်ရမှာနော်!)\n"
-        "  - *LUCKY* 🍀: ၇ အတိအကျ (ကဲ ဒါကတော့ ၅ ဆတောင် ပြန်ရမှာ!)\n\n"
-        "💰 *ဘယ်လိုလောင်းမလဲ:*\n"
-        "  - လောင်းကြေးထပ်ချိန် (မူရင်း ၁၀၀ မှတ်ပဲ ရှိသေးတယ်နော်) အတွင်း ခလုတ်လေးတွေကို နှိပ်ပြီး လောင်းလို့ရတယ်။\n"
-        "  - ဒါမှမဟုတ် ကိုယ်တိုင်ရိုက်ပြီး လောင်းမလား?: `/b <ပမာဏ>`, `/s <ပမာဏ>`, `/l <ပမာဏ>`\n"
-        "    (ဥပမာ: `big 500`, `small100`, `lucky 250` စသည်ဖြင့်ပေါ့!)\n"
-        "  _ပွဲတစ်ပွဲတည်းမှာ မတူညီတဲ့ ရလဒ်တွေပေါ် အကြိမ်ပေါင်းများစွာ လောင်းကြေးထပ်လို့ရတယ်နော်။_ \n\n"
-        "📊 *သုံးလို့ရတဲ့ အမိန့်တွေ:*\n"
-        "  - /score: ကိုယ့်မှာ လက်ရှိ ဘယ်နှစ်မှတ်ရှိလဲ ကြည့်ရအောင်!\n"
-        "  - /stats: ကိုယ့်ရဲ့ ဂိမ်းမှတ်တမ်း အသေးစိတ်လေးတွေ ကြည့်ဖို့ပေါ့။\n"
-        "  - /leaderboard: ဒီ Chat ထဲက အမှတ်အများဆုံး ထိပ်တန်း ကစားသမားတွေ ဘယ်သူတွေလဲ ကြည့်ရအောင်!\n"
-        "  - /history: မကြာသေးခင်က ပွဲစဉ်ရလဒ်လေးတွေ ပြန်ကြည့်ဖို့ပါ။\n\n"
-        "👑 *Admin တွေအတွက်ပဲနော်:*\n"
-        "  - /startdice: အန်စာတုံးလောင်းကြေးပွဲ အသစ်လေး စတင်လိုက်ရအောင်!\n"
-        "  - /adjustscore <user\\_id> <amount>: ကစားသမားတစ်ယောက်ရဲ့ မှတ်တွေကို ထည့်တာ/နှုတ်တာ လုပ်လို့ရတယ်။\n"
-        "  - /checkscore <user\\_id or @username>: ကစားသမားတစ်ယောက်ရဲ့ မှတ်တွေနဲ့ အချက်အလက်တွေ စစ်ဆေးကြည့်ဖို့ပေါ့။\n\n"
-        "ကဲ... ကံတရားက သင့်ဘက်မှာ အမြဲရှိပါစေရှင့်! 😉", # Feminine, casual tone
-        parse_mode="Markdown"
-    )
+    await update.message.reply_text(START_TEXT, parse_mode="Markdown")
 
 async def _start_interactive_game_round(chat_id: int, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -142,7 +312,7 @@ async def _start_interactive_game_round(chat_id: int, context: ContextTypes.DEFA
     """
     # --- Group ID check ---
     if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"_start_interactive_game_round: Ignoring action from disallowed chat ID: {chat_id}")
+        logger.info("_start_interactive_game_round: Ignoring action from disallowed chat ID: %s", chat_id)
         return
     # --- END Group ID check ---
 
@@ -150,37 +320,25 @@ async def _start_interactive_game_round(chat_id: int, context: ContextTypes.DEFA
     match_id = chat_specific_data["match_counter"] # Get chat-specific match counter
     chat_specific_data["match_counter"] += 1 # Increment chat-specific match counter
     
-    game = DiceGame(match_id, chat_id)
+    game = DiceGame.acquire(match_id, chat_id)
     context.chat_data["game"] = game # Store the game instance in chat-specific data
 
-    keyboard = InlineKeyboardMarkup([
-        [
-            InlineKeyboardButton("BIG 🔼 (Total > 7)", callback_data="bet_big"),
-            InlineKeyboardButton("SMALL 🔽 (Total < 7)", callback_data="bet_small"),
-            InlineKeyboardButton("LUCKY 🍀 (Total = 7)", callback_data="bet_lucky")
-        ]
-    ])
-
     await context.bot.send_message(
         chat_id,
-        f"🔥 *ပွဲစဉ် #{match_id}: လောင်းကြေးတွေ ဖွင့်လိုက်ပါပြီရှင်!* 🔥 \n\n" # Feminine, exciting intro
-        "💰 BIG (>7), SMALL (<7), ဒါမှမဟုတ် LUCKY (အတိအကျ 7) တို့ပေါ် လောင်းကြေးထပ်လိုက်ပါနော်။\n" # Feminine instructions
-        "ခလုတ်တွေ နှိပ်ပြီး လောင်းမလား (မူရင်း ၁၀၀ မှတ်)! ဒါမှမဟုတ် `big 250`, `s 50`, `lucky100` စသည်ဖြင့် ရိုက်ပြီး လောင်းမလား!?\n"
-        "_ပွဲတစ်ပွဲတည်းမှာ မတူညီတဲ့ ရလဒ်တွေပေါ် အကြိမ်ပေါင်းများစွာ လောင်းကြေးထပ်လို့ရတယ်နော်။_ \n\n"
-        "⏳ လောင်းကြေးတွေကို *စက္ကန့် ၆၀* အတွင်း ပိတ်တော့မယ်နော်! မြန်မြန်လေး... ကံကြမ္မာက သင့်ကိုစောင့်နေတယ်။ ကံကောင်းပါစေရှင့်! ✨", # Feminine, casual, urgent
-        parse_mode="Markdown", reply_markup=keyboard
+        ROUND_OPEN_PREFIX + str(match_id) + ROUND_OPEN_SUFFIX,
+        parse_mode="Markdown", reply_markup=BET_KEYBOARD
     )
-    logger.info(f"_start_interactive_game_round: Match {match_id} started successfully in chat {chat_id}. Betting open for 60 seconds.")
+    logger.info("_start_interactive_game_round: Match %s started successfully in chat %s. Betting open for 60 seconds.", match_id, chat_id)
 
     # Store the job object in chat_data to allow cancellation
     context.chat_data["close_bets_job"] = context.job_queue.run_once(
         close_bets_scheduled,
         60, # seconds from now
         chat_id=chat_id,
-        data=game,
+        data=game.token, # Jobs carry only the game's token; the game itself lives in chat_data
         name=f"close_bets_{chat_id}_{game.match_id}" # Give the job a name for easier identification/debugging
     )
-    logger.info(f"_start_interactive_game_round: Job for close_bets_scheduled scheduled for match {match_id} in chat {chat_id}.")
+    logger.info("_start_interactive_game_round: Job for close_bets_scheduled scheduled for match %s in chat %s.", match_id, chat_id)
 
 
 async def _manage_game_sequence(context: ContextTypes.DEFAULT_TYPE):
@@ -190,38 +348,29 @@ async def _manage_game_sequence(context: ContextTypes.DEFAULT_TYPE):
     chat_id = context.job.chat_id
     # --- Group ID check ---
     if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"_manage_game_sequence: Ignoring action from disallowed chat ID: {chat_id}")
+        logger.info("_manage_game_sequence: Ignoring action from disallowed chat ID: %s", chat_id)
         return
     # --- END Group ID check ---
     
-    num_matches_total = context.chat_data.get("num_matches_total")
-    current_match_index = context.chat_data.get("current_match_index")
+    sequence = context.chat_data.get("sequence")
 
-    if num_matches_total is None or current_match_index is None:
+    if sequence is None:
         logger.error(f"_manage_game_sequence: Missing sequence state in chat {chat_id}. Aborting sequence.")
-        if "num_matches_total" in context.chat_data: del context.chat_data["num_matches_total"]
-        if "current_match_index" in context.chat_data: del context.chat_data["current_match_index"]
-        if "game" in context.chat_data: del context.chat_data["game"]
+        context.chat_data.pop("game", None)
         # Clear next_game_job if sequence state is invalid, as no next game will be scheduled
-        if "next_game_job" in context.chat_data:
-            del context.chat_data["next_game_job"]
+        context.chat_data.pop("next_game_job", None)
         return
 
-    if current_match_index < num_matches_total:
-        logger.info(f"_manage_game_sequence: Starting next game in sequence. Match {current_match_index + 1} of {num_matches_total} for chat {chat_id}.")
-        context.chat_data["current_match_index"] += 1
+    if sequence.index < sequence.total:
+        logger.info("_manage_game_sequence: Starting next game in sequence. Match %s of %s for chat %s.", sequence.index + 1, sequence.total, chat_id)
+        sequence.index += 1
         await _start_interactive_game_round(chat_id, context)
     else:
-        logger.info(f"_manage_game_sequence: All {num_matches_total} matches in sequence completed for chat {chat_id}. Cleaning up.")
-        if "num_matches_total" in context.chat_data:
-            del context.chat_data["num_matches_total"]
-        if "current_match_index" in context.chat_data:
-            del context.chat_data["current_match_index"]
-        if "game" in context.chat_data:
-            del context.chat_data["game"]
+        logger.info("_manage_game_sequence: All %s matches in sequence completed for chat %s. Cleaning up.", sequence.total, chat_id)
+        del context.chat_data["sequence"]
+        context.chat_data.pop("game", None)
         # Clear next_game_job here as sequence has finished
-        if "next_game_job" in context.chat_data:
-            del context.chat_data["next_game_job"]
+        context.chat_data.pop("next_game_job", None)
         await context.bot.send_message(
             chat_id,
             "🎉 *စီစဉ်ထားတဲ့ ပွဲတွေ အားလုံး ပြီးဆုံးသွားပြီနော်!* 🎉\n" # Casual completion
@@ -239,21 +388,14 @@ async def start_dice(update: Update, context: ContextTypes.DEFAULT_TYPE):
     - If no number is provided, starts a single interactive betting round.
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"start_dice: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-    # --- END Group ID check ---
-
     user_id = update.effective_user.id
     username = update.effective_user.username or update.effective_user.first_name
-    logger.info(f"start_dice: User {user_id} ({username}) attempting to start a game in chat {chat_id}")
+    logger.info("start_dice: User %s (%s) attempting to start a game in chat %s", user_id, username, chat_id)
 
     chat_specific_data = get_chat_data_for_id(chat_id)
     # Check if admin list for this specific chat is loaded or empty
     if not chat_specific_data["group_admins"]:
-        logger.info(f"start_dice: Admin list for chat {chat_id} is empty or not loaded. Attempting to update it now.")
+        logger.info("start_dice: Admin list for chat %s is empty or not loaded. Attempting to update it now.", chat_id)
         if not await update_group_admins(chat_id, context):
             await update.message.reply_text(
                 "❌ Admin စာရင်းကို ရယူလို့မရသေးဘူးရှင့်။ Bot ကို 'Chat Admins တွေကို ရယူဖို့' ခွင့်ပြုချက် ပေးထားတာ သေချာလား စစ်ပေးပါဦးနော်။ ထပ်ပြီး ကြိုးစားကြည့်ပါဦး။", # Feminine, casual error
@@ -270,7 +412,7 @@ async def start_dice(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.warning(f"start_dice: Game already active in chat {chat_id}. State: {current_game.state}")
         return await update.message.reply_text("⚠️ ဟိတ်! ဂိမ်းက စနေပြီရှင့်။ အရင်ပွဲလေး ပြီးသွားမှပဲ အသစ်စလို့ရမယ်နော်။ နည်းနည်းလေး စောင့်ပေးပါဦး။", parse_mode="Markdown") # Feminine, casual waiting
     
-    if context.chat_data.get("num_matches_total") is not None:
+    if "sequence" in context.chat_data:
          return await update.message.reply_text("⚠️ ပွဲစဉ်တွေ ဆက်တိုက် စထားပြီးပြီနော်။ လက်ရှိပွဲစဉ်တွေ ပြီးဆုံးသွားတဲ့အထိ စောင့်ပေးပါဦးနော်။", parse_mode="Markdown") # Feminine, casual waiting
 
 
@@ -293,8 +435,7 @@ async def start_dice(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
     if num_matches_requested > 1:
-        context.chat_data["num_matches_total"] = num_matches_requested
-        context.chat_data["current_match_index"] = 0
+        context.chat_data["sequence"] = SequenceState(num_matches_requested)
 
         await update.message.reply_text(
             f"🎮 ဆက်တိုက် *{num_matches_requested}* ပွဲ စီစဉ်ပေးထားပြီနော်! ပထမပွဲအတွက် အဆင်သင့်ပြင်ထားလိုက်တော့! သွားပြီရှင့်!", # Feminine, casual countdown
@@ -313,89 +454,95 @@ async def start_dice(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 async def close_bets_scheduled(context: ContextTypes.DEFAULT_TYPE):
     job = context.job
-    game = job.data
-    chat_id = game.chat_id
+    token = job.data
+    chat_id = job.chat_id
 
     # --- Group ID check ---
     if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"close_bets_scheduled: Ignoring action from disallowed chat ID: {chat_id}")
+        logger.info("close_bets_scheduled: Ignoring action from disallowed chat ID: %s", chat_id)
         return
     # --- END Group ID check ---
 
-    logger.info(f"close_bets_scheduled: Job called for match {game.match_id} in chat {chat_id}.")
+    logger.info("close_bets_scheduled: Job called for game token %s in chat %s.", token, chat_id)
     
-    current_game_in_context = context.chat_data.get("game")
+    game = context.chat_data.get("game")
     # Also clear the close_bets_job after it has run
     if "close_bets_job" in context.chat_data:
         del context.chat_data["close_bets_job"]
 
-    if current_game_in_context is None or current_game_in_context != game:
-        logger.warning(f"close_bets_scheduled: Skipping action for match {game.match_id} in chat {chat_id} as game instance changed or no game. Current game: {current_game_in_context.match_id if current_game_in_context else 'None'}.")
+    if game is None or game.token != token:
+        logger.warning(f"close_bets_scheduled: Skipping action for game token {token} in chat {chat_id} as game instance changed or no game. Current game: {game.match_id if game else 'None'}.")
         return
 
     game.state = GAME_CLOSED
-    logger.info(f"close_bets_scheduled: Bets closed for match {game.match_id} in chat {chat_id}. State set to GAME_CLOSED.")
+    logger.info("close_bets_scheduled: Bets closed for match %s in chat %s. State set to GAME_CLOSED.", game.match_id, chat_id)
     
     bet_summary_lines = [
         f"⏳ *ပွဲစဉ် #{game.match_id}: လောင်းကြေးတွေ ပိတ်လိုက်ပါပြီနော်!* ⏳\n", # Feminine, casual closing
         "*လက်ရှိလောင်းကြေးတွေကတော့:*\n"
     ]
     
-    has_bets = False
-    for bet_type_key, bets_dict in game.bets.items():
-        if bets_dict:
-            has_bets = True
-            bet_summary_lines.append(f"  *{bet_type_key.upper()}* {RESULT_EMOJIS[bet_type_key]}:")
-            sorted_bets = sorted(bets_dict.items(), key=lambda item: item[1], reverse=True)
-            for uid, amount in sorted_bets:
-                player_info = get_chat_data_for_id(chat_id)["player_stats"].get(uid) # Use chat-specific player_stats
-                username_display = player_info['username'].replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`') if player_info else f"User {uid}"
-                bet_summary_lines.append(f"    → @{username_display}: *{amount}* မှတ်")
-    
-    if not has_bets:
+    if not game.user_totals: # No one placed a bet this match
         bet_summary_lines.append("  ဒီပွဲမှာ ဘယ်သူမှ လောင်းကြေးထပ်မထားကြပါဘူးရှင့်။ စိတ်မကောင်းစရာပဲနော်။") # Feminine, casual empty bets
-
-    bet_summary_lines.append("\nအန်စာတုံးလေးတွေ လှိမ့်နေပြီနော်... အဆင်သင့်ပြင်ထား! 💥") # Exciting
-    
-    try:
-        logger.info(f"close_bets_scheduled: Attempting to send 'Bets closed and summary' message for match {game.match_id} to chat {chat_id}.")
-        await context.bot.send_message(chat_id, "\n".join(bet_summary_lines), parse_mode="Markdown")
-        logger.info(f"close_bets_scheduled: 'Bets closed and summary' message sent successfully for match {game.match_id}.")
-    except Exception as e:
-        logger.error(f"close_bets_scheduled: Error sending 'Bets closed' message for chat {chat_id}: {e}", exc_info=True)
+    else:
+        player_stats = game.player_stats # Chat-specific player_stats, looked up once for all buckets
+        for heading, bets_dict in zip(BET_SUMMARY_HEADINGS, game.bet_buckets):
+            if bets_dict:
+                bet_summary_lines.append(heading)
+                # A single bettor needs no ordering
+                sorted_bets = sorted(bets_dict.items(), key=_BY_AMOUNT, reverse=True) if len(bets_dict) > 1 else bets_dict.items()
+                for uid, amount in sorted_bets:
+                    player_info = player_stats.get(uid)
+                    username_display = player_info['username_md'] if player_info else f"User {uid}"
+                    bet_summary_lines.append(f"    → @{username_display}: *{amount}* မှတ်")
+
+    # Sent together with the results by roll_and_announce_scheduled, saving one message per match
+    game.bet_summary = "\n".join(bet_summary_lines)
 
     # Store the job object for roll and announce
     context.chat_data["roll_and_announce_job"] = context.job_queue.run_once(
         roll_and_announce_scheduled,
-        30, # seconds from now
+        5, # seconds from now
         chat_id=chat_id,
-        data=game,
+        data=game.token,
         name=f"roll_announce_{chat_id}_{game.match_id}"
     )
-    logger.info(f"close_bets_scheduled: Job for roll_and_announce_scheduled set for 30 seconds for match {game.match_id} in chat {chat_id}.")
-    logger.info(f"close_bets_scheduled: Function finished for match {game.match_id} in chat {chat_id}.")
+    logger.info("close_bets_scheduled: Job for roll_and_announce_scheduled set for 5 seconds for match %s in chat %s.", game.match_id, chat_id)
+    logger.info("close_bets_scheduled: Function finished for match %s in chat %s.", game.match_id, chat_id)
+
+
+async def _send_results(context: ContextTypes.DEFAULT_TYPE, chat_id: int, match_id: int, text: str):
+    """
+    Sends a match's results message, logging (not raising) any failure.
+    """
+    try:
+        logger.info("roll_and_announce_scheduled: Attempting to send 'Results' message for match %s to chat %s.", match_id, chat_id)
+        await context.bot.send_message(chat_id, text, parse_mode="Markdown")
+        logger.info("roll_and_announce_scheduled: 'Results' message sent successfully for match %s.", match_id)
+    except Exception as e:
+        logger.error(f"roll_and_announce_scheduled: Error sending 'Results' message for chat {chat_id}: {e}", exc_info=True)
 
 
 async def roll_and_announce_scheduled(context: ContextTypes.DEFAULT_TYPE):
     job = context.job
-    game = job.data
-    chat_id = game.chat_id
+    token = job.data
+    chat_id = job.chat_id
 
     # --- Group ID check ---
     if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"roll_and_announce_scheduled: Ignoring action from disallowed chat ID: {chat_id}")
+        logger.info("roll_and_announce_scheduled: Ignoring action from disallowed chat ID: %s", chat_id)
         return
     # --- END Group ID check ---
 
-    logger.info(f"roll_and_announce_scheduled: Job called for match {game.match_id} in chat {chat_id}.")
+    logger.info("roll_and_announce_scheduled: Job called for game token %s in chat %s.", token, chat_id)
     
-    current_game_in_context = context.chat_data.get("game")
+    game = context.chat_data.get("game")
     # Also clear the roll_and_announce_job after it has run
     if "roll_and_announce_job" in context.chat_data:
         del context.chat_data["roll_and_announce_job"]
 
-    if current_game_in_context is not None and current_game_in_context != game and game.state != GAME_CLOSED:
-         logger.warning(f"roll_and_announce_scheduled: Skipping action for match {game.match_id} in chat {chat_id} due to invalid state or game instance change. Current game: {current_game_in_context.match_id if current_game_in_context else 'None'}, Game state: {game.state}.")
+    if game is None or game.token != token:
+         logger.warning(f"roll_and_announce_scheduled: Skipping action for game token {token} in chat {chat_id} as game instance changed or no game. Current game: {game.match_id if game else 'None'}.")
          return
     if game.state == GAME_OVER:
         logger.warning(f"roll_and_announce_scheduled: Skipping action for match {game.match_id} as it's already GAME_OVER.")
@@ -403,41 +550,47 @@ async def roll_and_announce_scheduled(context: ContextTypes.DEFAULT_TYPE):
     
     game.state = GAME_OVER
 
-    d1, d2 = 0, 0
+    # The second dice is sent while the first one is still in flight/animating instead of after it
+    logger.info("roll_and_announce_scheduled: Sending first animated dice for match %s.", game.match_id)
+    dice_task_1 = asyncio.create_task(context.bot.send_dice(chat_id=chat_id))
+    await asyncio.sleep(1.5)
 
-    try:
-        logger.info(f"roll_and_announce_scheduled: Sending first animated dice for match {game.match_id}.")
-        dice_message_1 = await context.bot.send_dice(chat_id=chat_id)
-        d1 = dice_message_1.dice.value
-        logger.info(f"roll_and_announce_scheduled: First dice rolled: {d1}.")
-        await asyncio.sleep(2)
-
-        logger.info(f"roll_and_announce_scheduled: Sending second animated dice for match {game.match_id}.")
-        dice_message_2 = await context.bot.send_dice(chat_id=chat_id)
-        d2 = dice_message_2.dice.value
-        logger.info(f"roll_and_announce_scheduled: Second dice rolled: {d2}.")
-        await asyncio.sleep(1)
+    logger.info("roll_and_announce_scheduled: Sending second animated dice for match %s.", game.match_id)
+    dice_task_2 = asyncio.create_task(context.bot.send_dice(chat_id=chat_id))
+    # return_exceptions=True waits for both sends, so a dice that was actually posted keeps its value
+    dice_outcomes = await asyncio.gather(dice_task_1, dice_task_2, return_exceptions=True)
 
-    except Exception as e:
-        logger.error(f"roll_and_announce_scheduled: Error sending animated dice for chat {chat_id}: {e}", exc_info=True)
-        logger.warning("Falling back to random dice values due to Telegram API error.")
-        d1, d2 = random.randint(1,6), random.randint(1,6)
+    dice_values = []
+    for dice_number, outcome in enumerate(dice_outcomes, start=1):
+        try:
+            if isinstance(outcome, BaseException):
+                raise outcome
+            dice_values.append(outcome.dice.value)
+        except Exception as e:
+            logger.error(f"roll_and_announce_scheduled: Error sending animated dice {dice_number} for chat {chat_id}: {e}", exc_info=True)
+            logger.warning(f"Falling back to a random value for dice {dice_number} due to Telegram API error.")
+            dice_values.append(_randrange(1, 7))
+    d1, d2 = dice_values
+    logger.info("roll_and_announce_scheduled: Dice rolled: %s and %s.", d1, d2)
+    await asyncio.sleep(1)
 
     game.result = d1 + d2
     winning_type, multiplier, individual_payouts = game.payout(chat_id)
 
-    result_message_text = (
-        f"🎉 *ပွဲစဉ် #{game.match_id} ရဲ့ ရလဒ်တွေ ထွက်ပေါ်လာပါပြီရှင့်!* 🎉\n" # Feminine, exciting results
-        f"🎲 *အန်စာတုံးလှိမ့်ကြည့်တော့:* *{d1}* + *{d2}* = *{d1 + d2}* ထွက်လာတယ်!\n" 
-        f"🏆 *အနိုင်ရလောင်းကြေးက:* *{winning_type.upper()}* {RESULT_EMOJIS[winning_type]} ပေါ် လောင်းထားသူတွေ *{multiplier} ဆ* ပြန်ရမှာနော်!\n\n" # Feminine, casual payout info
-        "*ငွေထုတ်ရရှိသူတွေကတော့:*\n" # Feminine, casual title
-    )
+    # Collected as lines and joined once when sending
+    result_lines = [game.bet_summary, ""] if game.bet_summary else [] # Bets-closed summary prepared by close_bets_scheduled
+    result_lines += [
+        f"🎉 *ပွဲစဉ် #{game.match_id} ရဲ့ ရလဒ်တွေ ထွက်ပေါ်လာပါပြီရှင့်!* 🎉", # Feminine, exciting results
+        f"🎲 *အန်စာတုံးလှိမ့်ကြည့်တော့:* *{d1}* + *{d2}* = *{d1 + d2}* ထွက်လာတယ်!",
+        f"🏆 *အနိုင်ရလောင်းကြေးက:* *{winning_type.upper()}* {RESULT_EMOJIS[winning_type]} ပေါ် လောင်းထားသူတွေ *{multiplier} ဆ* ပြန်ရမှာနော်!", # Feminine, casual payout info
+        "",
+        "*ငွေထုတ်ရရှိသူတွေကတော့:*" # Feminine, casual title
+    ]
     
-    chat_specific_data = get_chat_data_for_id(chat_id)
-    stats = chat_specific_data["player_stats"] # Use chat-specific player_stats
+    chat_specific_data = game.chat_data # Chat-specific data cached on the game; reused by the idle logic below
+    stats = game.player_stats # Use chat-specific player_stats
     
     if individual_payouts:
-        payout_lines = []
         sorted_payouts = sorted(
             individual_payouts.items(), 
             key=lambda item: (item[1], stats.get(item[0], {}).get('username', f"User {item[0]}")), 
@@ -447,48 +600,43 @@ async def roll_and_announce_scheduled(context: ContextTypes.DEFAULT_TYPE):
         for uid, winnings in sorted_payouts:
             player_info = stats.get(uid)
             if player_info:
-                username_display = player_info['username'].replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
-                payout_lines.append(f"  ✨ @{username_display}: *+{winnings}* မှတ် ရရှိပြီး အခုရမှတ်: *{player_info['score']}*!") # Feminine, enthusiastic
+                username_display = player_info['username_md']
+                result_lines.append(f"  ✨ @{username_display}: *+{winnings}* မှတ် ရရှိပြီး အခုရမှတ်: *{player_info['score']}*!") # Feminine, enthusiastic
             else:
-                payout_lines.append(f"  ✨ User ID {uid}: *+{winnings}* မှတ် ရရှိခဲ့ပါတယ် (အချက်အလက် မတွေ့ပါ)!") # Feminine, empathetic
-        result_message_text += "\n".join(payout_lines)
+                result_lines.append(f"  ✨ User ID {uid}: *+{winnings}* မှတ် ရရှိခဲ့ပါတယ် (အချက်အလက် မတွေ့ပါ)!") # Feminine, empathetic
     else:
-        result_message_text += "  ဒီတစ်ပွဲမှာတော့ ဘယ်သူမှ ကံမကောင်းခဲ့ဘူးရှင့်! စိတ်မပျက်ပါနဲ့၊ နောက်ပွဲမှာ အမှတ်တွေ ပုံအောလိုက်နော်! 💔" # Feminine, witty, empathetic loss
+        result_lines.append("  ဒီတစ်ပွဲမှာတော့ ဘယ်သူမှ ကံမကောင်းခဲ့ဘူးရှင့်! စိတ်မပျက်ပါနဲ့၊ နောက်ပွဲမှာ အမှတ်တွေ ပုံအောလိုက်နော်! 💔") # Feminine, witty, empathetic loss
 
     lost_players = []
-    for uid in game.participants:
+    for uid in game.user_totals: # Every participant of the match
         if uid not in individual_payouts:
             player_info = stats.get(uid)
             if player_info:
-                username_display = player_info['username'].replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
+                username_display = player_info['username_md']
                 lost_players.append(f"  💀 @{username_display} (ရမှတ်: *{player_info['score']}*) - ကံမကောင်းခဲ့ဘူးရှင့်!") # Feminine, witty
             else:
                 lost_players.append(f"  💀 User ID {uid} (ရမှတ်မတွေ့ပါ) - ဘယ်သူဘယ်ဝါမှန်းမသိဘဲ ရှုံးသွားတာလားရှင့်!") # Feminine, witty
 
     if lost_players:
-        result_message_text += "\n\n*ဒီပွဲမှာ ကံစမ်းခဲ့ကြသူတွေ (နဲ့ ကံနည်းသွားသူတွေ):*\n" # Feminine, casual title
-        result_message_text += "\n".join(lost_players)
+        result_lines.append("")
+        result_lines.append("*ဒီပွဲမှာ ကံစမ်းခဲ့ကြသူတွေ (နဲ့ ကံနည်းသွားသူတွေ):*") # Feminine, casual title
+        result_lines += lost_players
 
 
-    try:
-        logger.info(f"roll_and_announce_scheduled: Attempting to send 'Results' message for match {game.match_id} to chat {chat_id}.")
-        await context.bot.send_message(chat_id, result_message_text, parse_mode="Markdown")
-        logger.info(f"roll_and_announce_scheduled: 'Results' message sent successfully for match {game.match_id}.")
-    except Exception as e:
-        logger.error(f"roll_and_announce_scheduled: Error sending 'Results' message for chat {chat_id}: {e}", exc_info=True)
+    # Sent in the background while the bookkeeping below runs; awaited before anything else is sent
+    results_task = asyncio.create_task(_send_results(context, chat_id, game.match_id, "\n".join(result_lines)))
 
     # --- UPDATED: Idle match logic ---
-    chat_specific_data = get_chat_data_for_id(chat_id)
-    
-    if not game.participants: # No bets were placed in this match
+    if not game.user_totals: # No bets were placed in this match
         chat_specific_data["consecutive_idle_matches"] += 1
-        logger.info(f"No participants in match {game.match_id}. Consecutive idle matches for chat {chat_id}: {chat_specific_data['consecutive_idle_matches']}")
+        logger.info("No participants in match %s. Consecutive idle matches for chat %s: %s", game.match_id, chat_id, chat_specific_data['consecutive_idle_matches'])
     else:
         chat_specific_data["consecutive_idle_matches"] = 0 # Reset if bets were placed
-        logger.info(f"Participants found in match {game.match_id}. Resetting idle counter for chat {chat_id}.")
+        logger.info("Participants found in match %s. Resetting idle counter for chat %s.", game.match_id, chat_id)
 
     if chat_specific_data["consecutive_idle_matches"] >= 3:
-        logger.info(f"Stopping game sequence in chat {chat_id} due to 3 consecutive idle matches.")
+        logger.info("Stopping game sequence in chat %s due to 3 consecutive idle matches.", chat_id)
+        await results_task # Keep the results ahead of the stop notice
         await context.bot.send_message(
             chat_id,
             "😴 *ဂိမ်းရပ်သွားပြီနော်!* 😴\n\n" # Feminine, casual stop
@@ -497,9 +645,9 @@ async def roll_and_announce_scheduled(context: ContextTypes.DEFAULT_TYPE):
             parse_mode="Markdown"
         )
         # Force stop the game: clear game state and pending jobs
-        context.chat_data.pop("game", None)
-        context.chat_data.pop("num_matches_total", None)
-        context.chat_data.pop("current_match_index", None)
+        if context.chat_data.pop("game", None) is game:
+            game.release() # This job was the game's last user
+        context.chat_data.pop("sequence", None)
         
         # Cancel any pending sequence/next game jobs
         if "next_game_job" in context.chat_data:
@@ -524,8 +672,14 @@ async def roll_and_announce_scheduled(context: ContextTypes.DEFAULT_TYPE):
         return # Stop further processing for this match, no next game is scheduled
     # --- END UPDATED ---
 
-    if context.chat_data.get("num_matches_total") is not None:
-        logger.info(f"roll_and_announce_scheduled: Multi-match sequence active. Scheduling next game in sequence for chat {chat_id}.")
+    # Finished games are recycled below; nothing else refers to this one once this job ends
+    game_finished = context.chat_data.get("game") is game
+    if game_finished:
+        del context.chat_data["game"]
+        logger.info("roll_and_announce_scheduled: Cleaned up game data for chat %s after match %s.", chat_id, game.match_id)
+
+    if "sequence" in context.chat_data:
+        logger.info("roll_and_announce_scheduled: Multi-match sequence active. Scheduling next game in sequence for chat %s.", chat_id)
         # Store the job object for the next game in sequence
         context.chat_data["next_game_job"] = context.job_queue.run_once(
             _manage_game_sequence,
@@ -534,14 +688,14 @@ async def roll_and_announce_scheduled(context: ContextTypes.DEFAULT_TYPE):
             name=f"next_game_sequence_{chat_id}"
         )
     else:
-        if "game" in context.chat_data:
-            del context.chat_data["game"]
-            logger.info(f"roll_and_announce_scheduled: Cleaned up game data for chat {chat_id} after single interactive match {game.match_id}.")
         # Also clear next_game_job if it was part of a sequence that just ended
         if "next_game_job" in context.chat_data:
             del context.chat_data["next_game_job"]
 
-    logger.info(f"roll_and_announce_scheduled: Function finished for match {game.match_id} in chat {chat_id}.")
+    await results_task
+    logger.info("roll_and_announce_scheduled: Function finished for match %s in chat %s.", game.match_id, chat_id)
+    if game_finished:
+        game.release()
 
 
 async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -549,52 +703,60 @@ async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Handles inline keyboard button presses for placing bets.
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"button_callback: Ignoring callback from disallowed chat ID: {chat_id}")
-        await update.callback_query.answer(f"Sorry, this bot is not authorized to run in this group ({chat_id}).", show_alert=True)
-        return
-    # --- END Group ID check ---
-
     query = update.callback_query
-    await query.answer() 
     
     data = query.data
     user_id = query.from_user.id
     username = query.from_user.username or query.from_user.first_name
-    
-    # Escape username for Markdown
-    username_escaped = username.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
 
     game = context.chat_data.get("game")
     
+    # Rejections are only relevant to the presser, so they go in the callback answer itself (one API call, plain text)
     if not game:
-        logger.info(f"button_callback: User {user_id} ({username}) tried to bet via button but no game active in chat {chat_id}.")
-        return await query.message.reply_text(
-            f"⚠️ @{username_escaped} ရေ၊ အန်စာတုံးဂိမ်းက ဘယ်တုန်းကမှ မစသေးဘူးရှင့်။ Admin တစ်ယောက်က /startdice နဲ့ စပေးမှ ရမှာနော်။", # Feminine, casual no game
-            parse_mode="Markdown"
+        logger.info("button_callback: User %s (%s) tried to bet via button but no game active in chat %s.", user_id, username, chat_id)
+        return await query.answer(
+            "⚠️ အန်စာတုံးဂိမ်းက ဘယ်တုန်းကမှ မစသေးဘူးရှင့်။ Admin တစ်ယောက်က /startdice နဲ့ စပေးမှ ရမှာနော်။", # Feminine, casual no game
+            show_alert=True
         )
     
     if game.state != WAITING_FOR_BETS:
-        logger.info(f"button_callback: User {user_id} ({username}) tried to bet via button but betting is closed for match {game.match_id} in chat {chat_id}. State: {game.state}")
+        logger.info("button_callback: User %s (%s) tried to bet via button but betting is closed for match %s in chat %s. State: %s", user_id, username, game.match_id, chat_id, game.state)
+        return await query.answer(
+            "⚠️ ဒီဂိမ်းအတွက် လောင်းကြေးတွေ ပိတ်လိုက်ပြီနော်။ နောက်ပွဲကျမှ ပြန်လာခဲ့ပါဦး!", # Feminine, casual closed bets
+            show_alert=True
+        )
+
+    # Drop repeat presses of the same button that arrive within the double-tap window
+    press_key = (user_id, data)
+    now = time.monotonic()
+    if now - game.recent_presses.get(press_key, float("-inf")) < BUTTON_PRESS_WINDOW:
+        logger.info("button_callback: Ignoring repeated %s press from user %s in chat %s.", data, user_id, chat_id)
+        return await query.answer("⏳ ခဏလေး စောင့်ပေးပါဦးနော်...") # Feminine, casual wait
+    game.recent_presses[press_key] = now
+    token = game.token
+
+    await query.answer()
+
+    # The round may have closed, and its pooled DiceGame been reused by another chat, while answering
+    if context.chat_data.get("game") is not game or game.token != token or game.state != WAITING_FOR_BETS:
+        logger.info("button_callback: Round for game token %s in chat %s closed before user %s's bet could be placed.", token, chat_id, user_id)
         return await query.message.reply_text(
-            f"⚠️ @{username_escaped} ရေ၊ ဒီဂိမ်းအတွက် လောင်းကြေးတွေ ပိတ်လိုက်ပြီနော်။ နောက်ပွဲကျမှ ပြန်လာခဲ့ပါဦး!", # Feminine, casual closed bets
+            f"⚠️ @{escape_markdown(username)} ရေ၊ ဒီဂိမ်းအတွက် လောင်းကြေးတွေ ပိတ်လိုက်ပြီနော်။ နောက်ပွဲကျမှ ပြန်လာခဲ့ပါဦး!", # Feminine, casual closed bets
             parse_mode="Markdown"
         )
 
-    bet_type = data.split("_")[1]
+    bet_type = CALLBACK_BET_TYPES.get(data) # Unknown callback data is rejected by place_bet
     
-    success, response_message = game.place_bet(user_id, username, bet_type, 100)
+    success, response_message = game.place_bet(user_id, username, bet_type, BUTTON_BET_AMOUNT)
     
     # --- UPDATED: Reset idle counter on successful bet ---
     if success:
-        chat_specific_data = get_chat_data_for_id(chat_id)
-        chat_specific_data["consecutive_idle_matches"] = 0 
-        logger.info(f"button_callback: Bet placed by {user_id}, resetting idle counter for chat {chat_id}.")
+        game.chat_data["consecutive_idle_matches"] = 0 
+        logger.info("button_callback: Bet placed by %s, resetting idle counter for chat %s.", user_id, chat_id)
     # --- END UPDATED ---
 
     await query.message.reply_text(response_message, parse_mode="Markdown")
-    logger.info(f"button_callback: User {user_id} placed bet via button: {bet_type} (100 pts) in chat {chat_id}. Success: {success}")
+    logger.info("button_callback: User %s placed bet via button: %s (%s pts) in chat %s. Success: %s", user_id, bet_type, BUTTON_BET_AMOUNT, chat_id, success)
 
 
 async def handle_bet(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -602,55 +764,40 @@ async def handle_bet(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Handles text-based bet commands (e.g., 'b 500', 's 200', 'l 100', 'big 50', 'lucky50').
     It now expects a single bet per message and will not be chatty on non-bet text.
     """
-    chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"handle_bet: Ignoring message from disallowed chat ID: {chat_id}")
-        return # Do not send a reply to disallowed groups for non-command messages
-    # --- END Group ID check ---
+    message_text = update.message.text.strip()
+
+    # Cheapest filter first: anything that isn't a bet is ignored before any other work
+    bet_match = BET_REGEX.match(message_text)
+    if not bet_match:
+        logger.debug("handle_bet: Ignoring non-bet message '%s' in chat %s.", message_text, update.effective_chat.id)
+        return
 
+    chat_id = update.effective_chat.id
     user_id = update.effective_user.id
     username = update.effective_user.username or update.effective_user.first_name
-    message_text = update.message.text.strip()
     
-    username_escaped = username.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
+    username_escaped = escape_markdown(username)
 
-    logger.info(f"handle_bet: User {user_id} ({username}) attempting to place text bet: '{message_text}' in chat {chat_id}")
+    logger.info("handle_bet: User %s (%s) attempting to place text bet: '%s' in chat %s", user_id, username, message_text, chat_id)
 
     game = context.chat_data.get("game")
     if not game:
-        logger.info(f"handle_bet: User {user_id} tried to place text bet but no game active in chat {chat_id}.")
+        logger.info("handle_bet: User %s tried to place text bet but no game active in chat %s.", user_id, chat_id)
         return await update.message.reply_text(
             f"⚠️ @{username_escaped} ရေ၊ အန်စာတုံးဂိမ်းက ဘယ်တုန်းကမှ မစသေးဘူးရှင့်။ Admin တစ်ယောက်က /startdice နဲ့ စပေးမှ ရမှာနော်။", # Feminine, casual no game
             parse_mode="Markdown"
         )
     
     if game.state != WAITING_FOR_BETS:
-        logger.info(f"handle_bet: User {user_id} ({username}) tried to place text bet but betting is closed for match {game.match_id} in chat {chat_id}. State: {game.state}")
+        logger.info("handle_bet: User %s (%s) tried to place text bet but betting is closed for match %s in chat %s. State: %s", user_id, username, game.match_id, chat_id, game.state)
         return await update.message.reply_text(
             f"⚠️ @{username_escaped} ရေ၊ ဒီဂိမ်းအတွက် လောင်းကြေးတွေ ပိတ်လိုက်ပြီနော်။ နောက်ပွဲကျမှ ပြန်လာခဲ့ပါဦး!", # Feminine, casual closed bets
             parse_mode="Markdown"
         )
 
-    # Simplified regex for single bet parsing
-    bet_match = re.match(r"^(big|b|small|s|lucky|l)\s*(\d+)$", message_text, re.IGNORECASE)
-
-    if not bet_match:
-        logger.warning(f"handle_bet: Invalid bet format for user {user_id} in message: '{message_text}' in chat {chat_id}.")
-        return await update.message.reply_text(
-            f"❌ @{username_escaped} ရေ၊ လောင်းကြေးထပ်တာ ပုံစံလေး မှားနေတယ်ရှင့်။ ကျေးဇူးပြုပြီး: `big 500`, `small 100`, `lucky 250` စသည်ဖြင့် ရိုက်ပေးနော်။\n" # Feminine, casual invalid format
-            "ခလုတ်တွေ နှိပ်ပြီးတော့လည်း (မူရင်း ၁၀၀ မှတ်) လောင်းလို့ရတယ်နော်!",
-            parse_mode="Markdown"
-        )
-    
     bet_type_str, amount_str = bet_match.groups()
     
-    bet_types_map = {
-        "b": "big", "big": "big",
-        "s": "small", "small": "small",
-        "l": "lucky", "lucky": "lucky"
-    }
-    bet_type = bet_types_map.get(bet_type_str.lower())
+    bet_type = BET_TYPE_ALIASES[bet_type_str.lower()] # The regex only matches known aliases
     
     try:
         amount = int(amount_str)
@@ -663,13 +810,12 @@ async def handle_bet(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     # --- UPDATED: Reset idle counter on successful bet ---
     if success:
-        chat_specific_data = get_chat_data_for_id(chat_id)
-        chat_specific_data["consecutive_idle_matches"] = 0
-        logger.info(f"handle_bet: Bet placed by {user_id}, resetting idle counter for chat {chat_id}.")
+        game.chat_data["consecutive_idle_matches"] = 0
+        logger.info("handle_bet: Bet placed by %s, resetting idle counter for chat %s.", user_id, chat_id)
     # --- END UPDATED ---
 
     await update.message.reply_text(msg, parse_mode="Markdown")
-    logger.info(f"handle_bet: User {user_id} placed bet: {bet_type} {amount} pts in chat {chat_id}. Success: {success}")
+    logger.info("handle_bet: User %s placed bet: %s %s pts in chat %s. Success: %s", user_id, bet_type, amount, chat_id, success)
 
 
 async def show_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -677,16 +823,9 @@ async def show_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Displays the user's current points, total wins, and total losses.
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"show_score: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-    # --- END Group ID check ---
-
     user_id = update.effective_user.id
     username = update.effective_user.username or update.effective_user.first_name
-    logger.info(f"show_score: User {user_id} ({username}) requested score in chat {chat_id}")
+    logger.info("show_score: User %s (%s) requested score in chat %s", user_id, username, chat_id)
 
     chat_specific_data = get_chat_data_for_id(chat_id)
     player_stats = chat_specific_data["player_stats"].get(user_id) # Use chat-specific player_stats
@@ -709,28 +848,18 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
     including points, games played, wins, losses, win rate, and last active time.
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"show_stats: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-    # --- END Group ID check ---
-
     user_id = update.effective_user.id
     username = update.effective_user.username or update.effective_user.first_name
-    logger.info(f"show_stats: User {user_id} ({username}) requested detailed stats in chat {chat_id}")
+    logger.info("show_stats: User %s (%s) requested detailed stats in chat %s", user_id, username, chat_id)
 
     chat_specific_data = get_chat_data_for_id(chat_id)
     player_stats = chat_specific_data["player_stats"].get(user_id) # Use chat-specific player_stats
 
     if player_stats:
-        total_games = player_stats['wins'] + player_stats['losses']
-        win_rate = 0.0 
-        if total_games > 0:
-            win_rate = (player_stats['wins'] / total_games) * 100
-
+        total_games = player_stats['total_games']
+        win_rate = player_stats['win_rate']
 
-        username_display = player_stats['username'].replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
+        username_display = player_stats['username_md']
 
         await update.message.reply_text(
             f"👤 *@{username_display}* ရဲ့ အချက်အလက်လေးတွေကတော့:\n" # Feminine, casual intro
@@ -739,7 +868,7 @@ async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
             f"  ✅ အနိုင်ရခဲ့တာ: *{player_stats['wins']}* ပွဲ\n" 
             f"  ❌ ရှုံးနိမ့်ခဲ့တာ: *{player_stats['losses']}* ပွဲ\n" 
             f"  အနိုင်ရနှုန်း: *{win_rate:.1f}%* (ကြမ်းသလောက် မဆိုးပါဘူးနော်!)\n" # Feminine, witty comment
-            f"  နောက်ဆုံးလှုပ်ရှားခဲ့တဲ့အချိန်: *{player_stats['last_active'].strftime('%Y-%m-%d %H:%M')}*", # Feminine, casual time
+            f"  နောက်ဆုံးလှုပ်ရှားခဲ့တဲ့အချိန်: *{format_last_active(player_stats)}*", # Feminine, casual time
             parse_mode="Markdown"
         )
     else:
@@ -751,33 +880,28 @@ async def leaderboard(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Filters out players who haven't made any bets (still on initial 1000 points).
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"leaderboard: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-    # --- END Group ID check ---
-
-    logger.info(f"leaderboard: User {update.effective_user.id} requested leaderboard in chat {chat_id}")
+    logger.info("leaderboard: User %s requested leaderboard in chat %s", update.effective_user.id, chat_id)
 
     chat_specific_data = get_chat_data_for_id(chat_id)
+    leaderboard_text = chat_specific_data["leaderboard_text"]
+    if leaderboard_text is not None: # Nothing changed since the last /leaderboard
+        return await update.message.reply_text(leaderboard_text, parse_mode="Markdown")
+
     stats_for_chat = chat_specific_data["player_stats"] # Use chat-specific player_stats
     
-    active_players = [
-        p for p in stats_for_chat.values()
-        if p["wins"] > 0 or p["losses"] > 0 or p["score"] != INITIAL_PLAYER_SCORE
-    ]
-    top_players = sorted(active_players, key=lambda x: x["score"], reverse=True)[:10]
+    active_players = [p for p in stats_for_chat.values() if p["is_active"]]
+    top_players = heapq.nlargest(10, active_players, key=lambda x: x["score"]) # O(n log 10) instead of a full sort
 
     if not top_players:
         return await update.message.reply_text("ℹ️ ဒီ Chat ထဲမှာတော့ မှတ်တမ်းတင်ထားတဲ့ ကစားသမားတွေ မရှိသေးဘူးရှင့်။ ဂိမ်းစပြီး လောင်းကြေးထပ်လိုက်မှပဲ အမှတ်တွေတက်လာမှာနော်။", parse_mode="Markdown") # Feminine, casual no players
     
     message_lines = ["🏆 *ဒီ Chat ထဲက ထိပ်တန်းကစားသမားတွေ (ဦးဆောင်ဘုတ်) ကတော့:*\n"] # Feminine, casual title
     for i, player in enumerate(top_players):
-        username_display = player['username'].replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
+        username_display = player['username_md']
         message_lines.append(f"{i+1}. @{username_display}: *{player['score']}* မှတ် (အမိုက်စားပဲနော်!)") # Feminine, witty comment
     
-    await update.message.reply_text("\n".join(message_lines), parse_mode="Markdown")
+    leaderboard_text = chat_specific_data["leaderboard_text"] = "\n".join(message_lines)
+    await update.message.reply_text(leaderboard_text, parse_mode="Markdown")
 
 
 async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -785,14 +909,7 @@ async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
     Displays the recent match history for the current chat (last 5 matches).
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"history: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-    # --- END Group ID check ---
-
-    logger.info(f"history: User {update.effective_user.id} requested match history in chat {chat_id}")
+    logger.info("history: User %s requested match history in chat %s", update.effective_user.id, chat_id)
 
     chat_specific_data = get_chat_data_for_id(chat_id)
     match_history_for_chat = chat_specific_data["match_history"] # Use chat-specific match_history
@@ -801,14 +918,7 @@ async def history(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return await update.message.reply_text("ℹ️ ဒီ Chat ထဲမှာတော့ ပွဲမှတ်တမ်းတွေ မရှိသေးဘူးရှင့်။ မှတ်တမ်းတွေ ဖန်တီးချင်ရင် ဂိမ်းတွေ များများ ကစားပါဦးနော်။", parse_mode="Markdown") # Feminine, casual no history
     
     message_lines = ["📜 *မကြာသေးခင်က ပြီးသွားတဲ့ပွဲတွေ (နောက်ဆုံး ၅ ပွဲ) ကတော့:*\n"] # Feminine, casual title
-    for match in match_history_for_chat[-5:][::-1]: 
-        timestamp_str = match['timestamp'].strftime('%Y-%m-%d %H:%M')
-        winner_display = match['winner'].upper().replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
-        winner_emoji = RESULT_EMOJIS.get(match['winner'], '')
-        
-        message_lines.append(
-            f"  • ပွဲစဉ် #{match['match_id']} | ရလဒ်: *{match['result']}* ({winner_display} {winner_emoji}) | ပါဝင်ကစားသူ: *{match['participants']}* ယောက် | အချိန်: {timestamp_str}" # Feminine, casual details
-        )
+    message_lines.extend(format_history_line(match) for match in islice(reversed(match_history_for_chat), 5)) # Newest first; deques can't be sliced
     
     await update.message.reply_text("\n".join(message_lines), parse_mode="Markdown")
 
@@ -821,15 +931,8 @@ async def adjust_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
     - Direct input (@username): /adjustscore @username <amount>
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"adjust_score: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-    # --- END Group ID check ---
-
     requester_user_id = update.effective_user.id
-    logger.info(f"adjust_score: User {requester_user_id} attempting to adjust score in chat {chat_id}")
+    logger.info("adjust_score: User %s attempting to adjust score in chat %s", requester_user_id, chat_id)
 
     if not is_admin(chat_id, requester_user_id):
         logger.warning(f"adjust_score: User {requester_user_id} is not an admin and tried to adjust score in chat {chat_id}.")
@@ -876,11 +979,9 @@ async def adjust_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
             mentioned_username = first_arg[1:]
             
             # Try to find user in bot's in-memory player_stats first
-            for uid, player_info in chat_specific_data["player_stats"].items():
-                if player_info.get("username", "").lower() == mentioned_username.lower():
-                    target_user_id = uid
-                    target_username_display = player_info.get("username")
-                    break
+            target_user_id = find_user_by_username(chat_specific_data, mentioned_username)
+            if target_user_id is not None:
+                target_username_display = chat_specific_data["player_stats"][target_user_id]["username"]
             
             if target_user_id is None: # User not found in local player_stats by username
                 try:
@@ -903,11 +1004,7 @@ async def adjust_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
     else: # Neither reply nor valid direct args
         return await update.message.reply_text(
-            "❌ သုံးတဲ့ပုံစံလေး မှားနေတယ်နော်။ ကျေးဇူးပြုပြီး အောက်က ပုံစံတွေထဲက တစ်ခုခုကို သုံးပေးပါ:\n" # Feminine, casual invalid usage
-            "  - အသုံးပြုသူရဲ့ မက်ဆေ့ချ်ကို ပြန်ဖြေပြီး: `/adjustscore <ပမာဏ>`\n"
-            "  - တိုက်ရိုက်ရိုက်ထည့်ချင်ရင်: `/adjustscore <user_id>`\n"
-            "  - Username နဲ့ ရိုက်ထည့်ချင်ရင်: `/adjustscore @username <ပမာဏ>`\n"
-            "ဥပမာ- `/adjustscore 123456789 500` ဒါမှမဟုတ် `/adjustscore @someuser 100`။",
+            ADJUST_SCORE_USAGE,
             parse_mode="Markdown"
         )
 
@@ -921,17 +1018,21 @@ async def adjust_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if not target_player_stats:
         try:
-            chat_member = await context.bot.get_chat_member(chat_id, target_user_id)
-            fetched_username = chat_member.user.username or chat_member.user.first_name
+            fetched_username = await fetch_member_name(chat_id, target_user_id, context)
             
             player_stats_for_chat[target_user_id] = {
                 "username": fetched_username,
+                "username_md": escape_markdown(fetched_username), # Markdown-escaped username, stored so displays don't re-escape it
                 "score": INITIAL_PLAYER_SCORE,
                 "wins": 0,
                 "losses": 0,
+                "total_games": 0,
+                "win_rate": 0.0,
+                "is_active": False,
                 "last_active": datetime.now()
             }
             target_player_stats = player_stats_for_chat[target_user_id]
+            index_username(chat_specific_data, target_user_id, None, fetched_username)
             if target_username_display is None:
                 target_username_display = fetched_username 
         except Exception as e:
@@ -946,17 +1047,19 @@ async def adjust_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     old_score = target_player_stats['score']
     target_player_stats['score'] += amount_to_adjust
+    target_player_stats['is_active'] = True
+    chat_specific_data["leaderboard_text"] = None # Scores changed; /leaderboard re-renders on next use
     target_player_stats['last_active'] = datetime.now() 
     new_score = target_player_stats['score']
 
-    username_display_escaped = target_username_display.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
+    username_display_escaped = escape_markdown(target_username_display)
 
     await update.message.reply_text(
         f"✅ @{username_display_escaped} (ID: `{target_user_id}`) ရဲ့ ရမှတ်ကို *{amount_to_adjust}* မှတ် ချိန်ညှိပြီးပါပြီနော်။\n" # Feminine, casual confirmation
         f"အရင်ရမှတ်: *{old_score}* မှတ် | အခုရမှတ်: *{new_score}* မှတ်။ (ကဲ... အမှတ်တွေ ပြောင်းသွားပြီနော်!)", # Feminine, witty update
         parse_mode="Markdown"
     )
-    logger.info(f"adjust_score: User {requester_user_id} adjusted score for {target_user_id} in chat {chat_id} by {amount_to_adjust}. New score: {new_score}")
+    logger.info("adjust_score: User %s adjusted score for %s in chat %s by %s. New score: %s", requester_user_id, target_user_id, chat_id, amount_to_adjust, new_score)
 
 async def check_user_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -967,15 +1070,8 @@ async def check_user_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
     - Direct input (@username): /checkscore @username
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"check_user_score: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-    # --- END Group ID check ---
-
     requester_user_id = update.effective_user.id
-    logger.info(f"check_user_score: User {requester_user_id} attempting to check score in chat {chat_id}")
+    logger.info("check_user_score: User %s attempting to check score in chat %s", requester_user_id, chat_id)
 
     if not is_admin(chat_id, requester_user_id):
         logger.warning(f"check_user_score: User {requester_user_id} is not an admin and tried to check score in chat {chat_id}.")
@@ -987,7 +1083,7 @@ async def check_user_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if update.message.reply_to_message:
         target_user_id = update.message.reply_to_message.from_user.id
         target_username_display = update.message.reply_to_message.from_user.username or update.message.reply_to_message.from_user.first_name
-        logger.info(f"check_user_score: Admin {requester_user_id} checking score by reply for user {target_user_id}.")
+        logger.info("check_user_score: Admin %s checking score by reply for user %s.", requester_user_id, target_user_id)
     elif context.args and len(context.args) == 1:
         first_arg = context.args[0]
         
@@ -996,11 +1092,9 @@ async def check_user_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
             
             chat_specific_data = get_chat_data_for_id(chat_id)
             # Try to find user in bot's in-memory player_stats first
-            for uid, player_info in chat_specific_data["player_stats"].items():
-                if player_info.get("username", "").lower() == mentioned_username.lower():
-                    target_user_id = uid
-                    target_username_display = player_info.get("username")
-                    break
+            target_user_id = find_user_by_username(chat_specific_data, mentioned_username)
+            if target_user_id is not None:
+                target_username_display = chat_specific_data["player_stats"][target_user_id]["username"]
             
             if target_user_id is None: # User not found in local player_stats by username
                 try:
@@ -1014,7 +1108,7 @@ async def check_user_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
         else: # Numeric user ID provided
             try:
                 target_user_id = int(first_arg)
-                logger.info(f"check_user_score: Admin {requester_user_id} checking score by numeric ID for user {target_user_id}.")
+                logger.info("check_user_score: Admin %s checking score by numeric ID for user %s.", requester_user_id, target_user_id)
             except ValueError:
                 return await update.message.reply_text(
                     "❌ User ID ဒါမှမဟုတ် ပမာဏက မှားနေတယ်ရှင့်။ ကျေးဇူးပြုပြီး: `/checkscore <user_id>` ဒါမှမဟုတ် `/checkscore @username` ကိုသုံးပေးနော်။\n" # Feminine, casual error
@@ -1023,11 +1117,7 @@ async def check_user_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
                 )
     else:
         return await update.message.reply_text(
-            "❌ သုံးတဲ့ပုံစံလေး မှားနေတယ်နော်။ ကျေးဇူးပြုပြီး အောက်က ပုံစံတွေထဲက တစ်ခုခုကို သုံးပေးပါ:\n" # Feminine, casual invalid usage
-            "  - အသုံးပြုသူရဲ့ မက်ဆေ့ချ်ကို ပြန်ဖြေပြီး: `/checkscore`\n"
-            "  - တိုက်ရိုက်ရိုက်ထည့်ချင်ရင်: `/checkscore <user_id>`\n"
-            "  - Username နဲ့ ရိုက်ထည့်ချင်ရင်: `/checkscore @username`\n"
-            "ဥပမာ- `/checkscore 123456789` ဒါမှမဟုတ် `/checkscore @someuser`။",
+            CHECK_SCORE_USAGE,
             parse_mode="Markdown"
         )
 
@@ -1040,16 +1130,15 @@ async def check_user_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if not player_stats:
         try:
-            chat_member = await context.bot.get_chat_member(chat_id, target_user_id)
-            fetched_username = chat_member.user.username or chat_member.user.first_name
-            username_display_escaped = fetched_username.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
+            fetched_username = await fetch_member_name(chat_id, target_user_id, context)
+            username_display_escaped = escape_markdown(fetched_username)
             
             await update.message.reply_text(
                 f"👤 *@{username_display_escaped}* (ID: `{target_user_id}`) မှာတော့ ဒီ Chat အတွက် ဂိမ်းမှတ်တမ်းတွေ မရှိသေးဘူးရှင့်။\n" # Feminine, casual no stats
                 f"သူတို့ရဲ့ လက်ရှိရမှတ်ကတော့ *{INITIAL_PLAYER_SCORE}* မှတ်ပဲ ရှိသေးတာပေါ့နော်။", # Feminine, casual score
                 parse_mode="Markdown"
             )
-            logger.info(f"check_user_score: Admin {requester_user_id} checked score for new user {target_user_id} (no stats yet).")
+            logger.info("check_user_score: Admin %s checked score for new user %s (no stats yet).", requester_user_id, target_user_id)
             return # Exit after informing user
 
         except Exception as e:
@@ -1063,12 +1152,10 @@ async def check_user_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
         target_username_display = player_stats.get('username', f"User {target_user_id}")
     
     # Rest of the check_user_score logic (displaying stats)
-    total_games = player_stats['wins'] + player_stats['losses']
-    win_rate = 0.0
-    if total_games > 0:
-        win_rate = (player_stats['wins'] / total_games) * 100
+    total_games = player_stats['total_games']
+    win_rate = player_stats['win_rate']
 
-    username_display_escaped = target_username_display.replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
+    username_display_escaped = escape_markdown(target_username_display)
 
     await update.message.reply_text(
         f"👤 *@{username_display_escaped}* ရဲ့ အချက်အလက်တွေ (ID: `{target_user_id}`) ကတော့:\n" # Feminine, casual intro
@@ -1077,23 +1164,16 @@ async def check_user_score(update: Update, context: ContextTypes.DEFAULT_TYPE):
         f"  ✅ အနိုင်ရခဲ့တာ: *{player_stats['wins']}* ပွဲ\n"
         f"  ❌ ရှုံးနိမ့်ခဲ့တာ: *{player_stats['losses']}* ပွဲ\n"
         f"  အနိုင်ရနှုန်း: *{win_rate:.1f}%* (ကြမ်းသလောက် မဆိုးပါဘူးနော်!)\n" # Feminine, witty comment
-        f"  နောက်ဆုံးလှုပ်ရှားခဲ့တဲ့အချိန်: *{player_stats['last_active'].strftime('%Y-%m-%d %H:%M')}*", # Feminine, casual time
+        f"  နောက်ဆုံးလှုပ်ရှားခဲ့တဲ့အချိန်: *{format_last_active(player_stats)}*", # Feminine, casual time
         parse_mode="Markdown"
     )
-    logger.info(f"check_user_score: Admin {requester_user_id} successfully checked score for user {target_user_id}.")
+    logger.info("check_user_score: Admin %s successfully checked score for user %s.", requester_user_id, target_user_id)
 
 async def refresh_admins(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     Admin command to force a refresh of the group's admin list.
     """
     chat_id = update.effective_chat.id
-    # --- Group ID check ---
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"refresh_admins: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-    # --- END Group ID check ---
-
     user_id = update.effective_user.id
 
     # Allow hardcoded global admins to use this even if group_admins isn't yet populated
@@ -1101,9 +1181,9 @@ async def refresh_admins(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.warning(f"refresh_admins: User {user_id} tried to refresh admins in chat {chat_id} but is not an admin.")
         return await update.message.reply_text("❌ Admin တွေပဲ Admin စာရင်းကို ပြန် Refresh လုပ်လို့ရတာနော်။", parse_mode="Markdown") # Feminine, casual admin check
 
-    logger.info(f"refresh_admins: User {user_id} attempting to refresh admin list for chat {chat_id}.")
+    logger.info("refresh_admins: User %s attempting to refresh admin list for chat %s.", user_id, chat_id)
     
-    if await update_group_admins(chat_id, context):
+    if await update_group_admins(chat_id, context, force=True):
         await update.message.reply_text("✅ Admin စာရင်းကို အောင်မြင်စွာ ပြန် Refresh လုပ်ပြီးပါပြီရှင့်! အခုဆို အချက်အလက်တွေ အသစ်ဖြစ်သွားပြီနော်။", parse_mode="Markdown") # Feminine, casual success
     else:
         await update.message.reply_text(
@@ -1123,14 +1203,9 @@ async def stop_game(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     chat_id = update.effective_chat.id
 
-    if chat_id not in ALLOWED_GROUP_IDS:
-        logger.info(f"stop_game: Ignoring command from disallowed chat ID: {chat_id}")
-        await update.message.reply_text(f"Sorry, this bot is not authorized to run in this group ({chat_id}). Please add it to an allowed group.", parse_mode="Markdown")
-        return
-
     user_id = update.effective_user.id
     username = update.effective_user.username or update.effective_user.first_name
-    logger.info(f"stop_game: User {user_id} ({username}) attempting to stop a game in chat {chat_id}")
+    logger.info("stop_game: User %s (%s) attempting to stop a game in chat %s", user_id, username, chat_id)
 
     if not is_admin(chat_id, user_id): # Check if the requester is an admin
         logger.warning(f"stop_game: User {user_id} is not an admin and tried to stop a game in chat {chat_id}.")
@@ -1140,14 +1215,14 @@ async def stop_game(update: Update, context: ContextTypes.DEFAULT_TYPE):
     current_game = context.chat_data.get("game")
 
     if not current_game:
-        logger.info(f"stop_game: No game object found in chat_data for chat {chat_id}.")
+        logger.info("stop_game: No game object found in chat_data for chat %s.", chat_id)
         return await update.message.reply_text(
             "ℹ️ လက်ရှိစတင်ထားတဲ့ အန်စာတုံးဂိမ်း မရှိသေးဘူးရှင့်။ ရပ်ဖို့လည်း မလိုဘူးပေါ့! စတင်ဖို့ Admin က /startdice နဲ့ စရမယ်နော်။", # Feminine, witty, casual no game
             parse_mode="Markdown"
         )
     
     if current_game.state == GAME_OVER:
-        logger.info(f"stop_game: Game is already GAME_OVER for match {current_game.match_id} in chat {chat_id}.")
+        logger.info("stop_game: Game is already GAME_OVER for match %s in chat %s.", current_game.match_id, chat_id)
         return await update.message.reply_text(
             f"ℹ️ ပွဲစဉ် #{current_game.match_id} က ပြီးသွားပါပြီရှင့်။ ပြီးသွားတဲ့ပွဲကို ရပ်လို့မရဘူးနော်။ နောက်ပွဲကျမှ ကြိုးစားကြည့်ပါ!", # Feminine, witty, casual finished game
             parse_mode="Markdown"
@@ -1161,7 +1236,7 @@ async def stop_game(update: Update, context: ContextTypes.DEFAULT_TYPE):
         if job:
             try:
                 job.schedule_removal()
-                logger.info(f"stop_game: Canceled job '{job.name}' ({job_key}) for chat {chat_id}.")
+                logger.info("stop_game: Canceled job '%s' (%s) for chat %s.", job.name, job_key, chat_id)
             except JobLookupError:
                 logger.warning(f"stop_game: Job '{job_key}' with ID '{job.id}' for chat {chat_id} was already removed or never existed. Continuing.")
             except Exception as e:
@@ -1169,39 +1244,38 @@ async def stop_game(update: Update, context: ContextTypes.DEFAULT_TYPE):
             finally:
                 # Always remove the job reference from chat_data after attempting to remove it
                 context.chat_data.pop(job_key, None)
-                logger.debug(f"stop_game: Cleared job reference '{job_key}' from chat_data for chat {chat_id}.")
+                logger.debug("stop_game: Cleared job reference '%s' from chat_data for chat %s.", job_key, chat_id)
 
 
     refunded_players_info = []
-    player_stats_for_chat = get_chat_data_for_id(chat_id)["player_stats"]
+    chat_specific_data = get_chat_data_for_id(chat_id)
+    player_stats_for_chat = chat_specific_data["player_stats"]
+    now = datetime.now() # One timestamp for every refunded player
 
     # Process refunds for all bets placed in the current game
     total_refunded_amount = 0
-    total_bets_by_user = {} # Aggregate total bets per user across all bet types
 
-    for bet_type_dict in current_game.bets.values():
-        for uid, amount_bet in bet_type_dict.items():
-            total_bets_by_user[uid] = total_bets_by_user.get(uid, 0) + amount_bet
-    
-    for uid, refunded_amount in total_bets_by_user.items():
+    for uid, refunded_amount in current_game.user_totals.items(): # Total bets per user across all bet types
         if uid in player_stats_for_chat:
             player_stats = player_stats_for_chat[uid]
             player_stats["score"] += refunded_amount # Add refunded amount back to score
-            player_stats["last_active"] = datetime.now() # Update last active time
+            player_stats["last_active"] = now # Update last active time
             total_refunded_amount += refunded_amount
             
-            username_display = player_stats['username'].replace('_', '\\_').replace('*', '\\*').replace('[', '\\[').replace('`', '\\`')
+            username_display = player_stats['username_md']
             refunded_players_info.append(
                 f"  @{username_display}: *+{refunded_amount}* မှတ် (အခုရမှတ်: *{player_stats['score']}*)"
             )
-            logger.info(f"stop_game: Refunded {refunded_amount} to user {uid} in chat {chat_id}. New score: {player_stats['score']}")
+            logger.info("stop_game: Refunded %s to user %s in chat %s. New score: %s", refunded_amount, uid, chat_id, player_stats['score'])
         else:
             logger.warning(f"stop_game: Could not find player {uid} in stats for refund in chat {chat_id}.")
 
+    if total_refunded_amount:
+        chat_specific_data["leaderboard_text"] = None # Refunds changed scores
+
     # Clear the current game instance and any sequence-related state from context.chat_data
     context.chat_data.pop("game", None)
-    context.chat_data.pop("num_matches_total", None)
-    context.chat_data.pop("current_match_index", None)
+    context.chat_data.pop("sequence", None)
     # The individual job keys should already be popped by the loop above, but ensure it.
     context.chat_data.pop("close_bets_job", None)
     context.chat_data.pop("roll_and_announce_job", None)
@@ -1216,4 +1290,4 @@ async def stop_game(update: Update, context: ContextTypes.DEFAULT_TYPE):
         refund_message += "ဒီပွဲမှာ ဘယ်သူမှ မလောင်းထားတော့ ပြန်အမ်းစရာ မရှိဘူးရှင့်။ (အားနာလိုက်တာနော် 😅)" # Feminine, witty no refunds
 
     await update.message.reply_text(refund_message, parse_mode="Markdown")
-    logger.info(f"stop_game: Match {current_game.match_id} successfully stopped and bets refunded in chat {chat_id}.")
+    logger.info("stop_game: Match %s successfully stopped and bets refunded in chat %s.", current_game.match_id, chat_id)
@@ -1,16 +1,15 @@
 import logging
 import asyncio # Re-added asyncio for sleep (still needed for context.job_queue functions)
-import re # Added for more flexible regex matching
 import os # Added for environment variable access
 
 from telegram.ext import (
     ApplicationBuilder, CommandHandler, MessageHandler,
-    CallbackQueryHandler, ChatMemberHandler, ContextTypes, filters
+    CallbackQueryHandler, ChatMemberHandler, TypeHandler, ContextTypes, filters
 )
 from telegram import Update # Import Update for type hinting in handlers
 
 # Import handlers and constants from local files
-from handlers import start, start_dice, close_bets_scheduled, roll_and_announce_scheduled, button_callback, handle_bet, show_score, show_stats, leaderboard, history, adjust_score, check_user_score, on_chat_member_update, refresh_admins, stop_game # Added stop_game
+from handlers import start, start_dice, close_bets_scheduled, roll_and_announce_scheduled, button_callback, handle_bet, show_score, show_stats, leaderboard, history, adjust_score, check_user_score, on_chat_member_update, refresh_admins, stop_game, allowed_group_gate, BET_REGEX # Added stop_game
 from constants import global_data, HARDCODED_ADMINS, INITIAL_PLAYER_SCORE, ALLOWED_GROUP_IDS
 # --- END REVERTED ---
 
@@ -25,7 +24,7 @@ logger = logging.getLogger(__name__)
 async def unhandled_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Logs all text messages that are not handled by other specific handlers."""
     if update.message and update.message.text:
-        logger.debug(f"Unhandled text message received: '{update.message.text}' from user {update.effective_user.id} in chat {update.effective_chat.id}")
+        logger.debug("Unhandled text message received: '%s' from user %s in chat %s", update.message.text, update.effective_user.id, update.effective_chat.id)
 
 
 def main():
@@ -47,6 +46,9 @@ def main():
     # Initialize the Application with your bot token.
     application = ApplicationBuilder().token(bot_token).build()
     
+    # Drop updates from chats outside ALLOWED_GROUP_IDS before any other handler sees them
+    application.add_handler(TypeHandler(Update, allowed_group_gate), group=-1)
+
     # Register command handlers
     application.add_handler(CommandHandler("start", start))
     application.add_handler(CommandHandler("startdice", start_dice))
@@ -64,7 +66,7 @@ def main():
     
     # Register message handler for text-based bets.
     # We now filter for messages that match the bet regex
-    bet_regex_pattern = re.compile(r"^(big|b|small|s|lucky|l)\s*(\d+)$", re.IGNORECASE)
+    bet_regex_pattern = BET_REGEX # Same compiled pattern handle_bet parses with
     application.add_handler(MessageHandler(filters.Regex(bet_regex_pattern) & filters.TEXT, handle_bet))
 
     # Add a fallback handler for any text messages that are not commands or specific bets
@@ -0,0 +1,67 @@
+import unittest
+
+from constants import global_data, get_chat_data_for_id, escape_markdown, index_username, find_user_by_username
+
+
+class EscapeMarkdownTest(unittest.TestCase):
+    def test_clean_text_is_returned_unchanged(self):
+        self.assertEqual(escape_markdown("mgmg"), "mgmg")
+        self.assertEqual(escape_markdown("Aung Aung"), "Aung Aung")
+
+    def test_escapes_every_markdown_special(self):
+        self.assertEqual(escape_markdown("a_b*c[d`e"), "a\\_b\\*c\\[d\\`e")
+
+    def test_escapes_repeated_specials(self):
+        self.assertEqual(escape_markdown("__init__"), "\\_\\_init\\_\\_")
+
+    def test_leaves_other_punctuation_alone(self):
+        self.assertEqual(escape_markdown("a]b(c)d~e"), "a]b(c)d~e")
+
+
+class UsernameIndexTest(unittest.TestCase):
+    CHAT_ID = -100
+
+    def setUp(self):
+        self.chat_data = get_chat_data_for_id(self.CHAT_ID)
+
+    def tearDown(self):
+        global_data["all_chat_data"].pop(self.CHAT_ID, None)
+
+    def add_player(self, user_id, username):
+        self.chat_data["player_stats"][user_id] = {"username": username}
+        index_username(self.chat_data, user_id, None, username)
+
+    def rename(self, user_id, new_username):
+        player = self.chat_data["player_stats"][user_id]
+        index_username(self.chat_data, user_id, player["username"], new_username)
+        player["username"] = new_username
+
+    def test_lookup_is_case_insensitive(self):
+        self.add_player(1, "MgMg")
+        self.assertEqual(find_user_by_username(self.chat_data, "mgmg"), 1)
+        self.assertIsNone(find_user_by_username(self.chat_data, "someone"))
+
+    def test_rename_moves_the_player_to_the_new_name(self):
+        self.add_player(1, "MgMg")
+        self.rename(1, "KoKo")
+        self.assertIsNone(find_user_by_username(self.chat_data, "MgMg"))
+        self.assertEqual(find_user_by_username(self.chat_data, "KoKo"), 1)
+        self.assertNotIn("mgmg", self.chat_data["username_index"])
+
+    def test_shared_name_resolves_to_the_first_player(self):
+        self.add_player(1, "Aung")
+        self.add_player(2, "aung")
+        self.assertEqual(find_user_by_username(self.chat_data, "AUNG"), 1)
+
+    def test_renaming_one_of_a_shared_name_keeps_the_other(self):
+        self.add_player(1, "Aung")
+        self.add_player(2, "Aung")
+        self.rename(2, "Mya")
+        self.assertEqual(find_user_by_username(self.chat_data, "Aung"), 1)
+        self.assertEqual(find_user_by_username(self.chat_data, "Mya"), 2)
+        self.rename(1, "Hla")
+        self.assertIsNone(find_user_by_username(self.chat_data, "Aung"))
+
+
+if __name__ == "__main__":
+    unittest.main()
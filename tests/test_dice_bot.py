@@ -0,0 +1,61 @@
+import asyncio
+import importlib.util
+import json
+import os
+import tempfile
+import unittest
+
+# dice_bot imports python-telegram-bot at module level
+HAS_BOT_DEPS = all(importlib.util.find_spec(name) for name in ("telegram", "dotenv"))
+
+if HAS_BOT_DEPS:
+    import dice_bot
+
+
+@unittest.skipUnless(HAS_BOT_DEPS, "python-telegram-bot and python-dotenv are required")
+class FlushDataTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.data_file = os.path.join(self.tmp_dir.name, "dice_bot_data.json")
+        self.saved = (dice_bot.DATA_FILE, dice_bot.users, dice_bot.leaderboard, dice_bot.data_dirty)
+        dice_bot.DATA_FILE = self.data_file
+        dice_bot.users = {42: {"username": "MgMg", "points": 1500, "bets": {}, "total_bet": 0, "wins": 1, "losses": 0}}
+        dice_bot.leaderboard = {42: 1500}
+        dice_bot.data_dirty = False
+
+    def tearDown(self):
+        dice_bot.DATA_FILE, dice_bot.users, dice_bot.leaderboard, dice_bot.data_dirty = self.saved
+        self.tmp_dir.cleanup()
+
+    def test_clean_state_is_not_written(self):
+        asyncio.run(dice_bot.flush_data(None))
+        self.assertFalse(os.path.exists(self.data_file))
+
+    def test_dirty_state_is_written_once(self):
+        dice_bot.mark_dirty()
+        asyncio.run(dice_bot.flush_data(None))
+        self.assertFalse(dice_bot.data_dirty)
+        with open(self.data_file) as f:
+            data = json.load(f)
+        self.assertEqual(data["leaderboard"], {"42": 1500})
+        self.assertEqual(data["users"]["42"]["points"], 1500)
+        self.assertFalse(os.path.exists(self.data_file + ".tmp"))
+
+    def test_saved_state_loads_back(self):
+        dice_bot.mark_dirty()
+        asyncio.run(dice_bot.flush_data(None))
+        expected_users = dice_bot.users
+        dice_bot.users, dice_bot.leaderboard = {}, {}
+        dice_bot.load_data()
+        self.assertEqual(dice_bot.users, expected_users)
+        self.assertEqual(dice_bot.leaderboard, {42: 1500})
+
+    def test_failed_save_stays_dirty(self):
+        dice_bot.DATA_FILE = os.path.join(self.tmp_dir.name, "missing", "dice_bot_data.json")
+        dice_bot.mark_dirty()
+        asyncio.run(dice_bot.flush_data(None))
+        self.assertTrue(dice_bot.data_dirty)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,99 @@
+import unittest
+
+from constants import global_data, INITIAL_PLAYER_SCORE
+from game_logic import DiceGame, OUTCOME_BY_ROLL, WAITING_FOR_BETS, GAME_CLOSED
+
+
+class DiceGameTest(unittest.TestCase):
+    CHAT_ID = -200
+
+    def setUp(self):
+        DiceGame._pool.clear()
+        self.game = DiceGame.acquire(1, self.CHAT_ID)
+
+    def tearDown(self):
+        DiceGame._pool.clear()
+        global_data["all_chat_data"].pop(self.CHAT_ID, None)
+
+    def test_place_bet_deducts_score_and_records_bet(self):
+        success, _ = self.game.place_bet(10, "MgMg", "big", 300)
+        self.assertTrue(success)
+        player = self.game.player_stats[10]
+        self.assertEqual(player["score"], INITIAL_PLAYER_SCORE - 300)
+        self.assertTrue(player["is_active"])
+        self.assertEqual(self.game.bets_big, {10: 300})
+        self.assertEqual(self.game.user_totals, {10: 300})
+
+    def test_place_bet_aggregates_repeat_bets(self):
+        self.game.place_bet(10, "MgMg", "small", 100)
+        self.game.place_bet(10, "MgMg", "small", 50)
+        self.game.place_bet(10, "MgMg", "lucky", 25)
+        self.assertEqual(self.game.bets_small, {10: 150})
+        self.assertEqual(self.game.bets_lucky, {10: 25})
+        self.assertEqual(self.game.user_totals, {10: 175})
+
+    def test_place_bet_rejects_invalid_bets(self):
+        self.assertFalse(self.game.place_bet(10, "MgMg", "huge", 100)[0])
+        self.assertFalse(self.game.place_bet(10, "MgMg", "big", 0)[0])
+        self.assertFalse(self.game.place_bet(10, "MgMg", "big", INITIAL_PLAYER_SCORE + 1)[0])
+        self.assertEqual(self.game.user_totals, {})
+
+    def test_place_bet_rejects_bets_once_closed(self):
+        self.game.state = GAME_CLOSED
+        self.assertFalse(self.game.place_bet(10, "MgMg", "big", 100)[0])
+        self.assertNotIn(10, self.game.player_stats)
+
+    def test_rename_invalidates_cached_leaderboard_even_if_bet_fails(self):
+        self.game.place_bet(10, "MgMg", "big", 100)
+        self.game.chat_data["leaderboard_text"] = "cached"
+        success, _ = self.game.place_bet(10, "Ko_Ko", "big", INITIAL_PLAYER_SCORE)
+        self.assertFalse(success)
+        self.assertIsNone(self.game.chat_data["leaderboard_text"])
+        self.assertEqual(self.game.player_stats[10]["username_md"], "Ko\\_Ko")
+
+    def test_outcome_table_matches_the_rules(self):
+        for total in range(2, 13):
+            expected = ("small", 2.0) if total < 7 else ("lucky", 5.0) if total == 7 else ("big", 2.0)
+            self.assertEqual(OUTCOME_BY_ROLL[total], expected)
+
+    def test_payout_pays_winners_and_counts_losses(self):
+        self.game.place_bet(10, "MgMg", "lucky", 100)
+        self.game.place_bet(20, "KoKo", "big", 200)
+        self.game.result = 7
+        winning_type, multiplier, payouts = self.game.payout(self.CHAT_ID)
+
+        self.assertEqual((winning_type, multiplier), ("lucky", 5.0))
+        self.assertEqual(payouts, {10: 500})
+        winner, loser = self.game.player_stats[10], self.game.player_stats[20]
+        self.assertEqual(winner["score"], INITIAL_PLAYER_SCORE - 100 + 500)
+        self.assertEqual((winner["wins"], winner["losses"], winner["win_rate"]), (1, 0, 100.0))
+        self.assertEqual(loser["score"], INITIAL_PLAYER_SCORE - 200)
+        self.assertEqual((loser["wins"], loser["losses"], loser["total_games"]), (0, 1, 1))
+
+        entry = self.game.chat_data["match_history"][-1]
+        self.assertEqual((entry["match_id"], entry["result"], entry["winner"], entry["participants"]), (1, 7, "lucky", 2))
+
+    def test_payout_without_result_is_an_error(self):
+        self.assertEqual(self.game.payout(self.CHAT_ID), ("error", 0.0, {}))
+
+    def test_release_clears_the_game_and_acquire_reuses_it(self):
+        self.game.place_bet(10, "MgMg", "big", 100)
+        self.game.result = 9
+        self.game.bet_summary = "summary"
+        old_token = self.game.token
+        self.game.release()
+
+        self.assertEqual(DiceGame._pool, [self.game])
+        self.assertEqual((self.game.bets_big, self.game.user_totals, self.game.recent_presses), ({}, {}, {}))
+        self.assertIsNone(self.game.result)
+        self.assertIsNone(self.game.bet_summary)
+
+        reused = DiceGame.acquire(2, self.CHAT_ID)
+        self.assertIs(reused, self.game)
+        self.assertEqual((reused.match_id, reused.state), (2, WAITING_FOR_BETS))
+        self.assertNotEqual(reused.token, old_token)
+        self.assertEqual(DiceGame._pool, [])
+
+
+if __name__ == "__main__":
+    unittest.main()